@@ -5,12 +5,6 @@
 主程序入口
 """
 
-import sys
-import os
-
-# 添加src目录到Python路径
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
-
 from src.core.main_controller import MainController
 
 
@@ -1,19 +1,107 @@
-import json
+import heapq
+import threading
+import time
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from collections import OrderedDict
+from operator import itemgetter
+from types import MappingProxyType
 from typing import List, Dict, Any, Optional
 
 from ..utils.logger import Logger
+from ..utils.query_cache import QueryCache
+
+
+_by_score = itemgetter("score")
+
+# 官网标题优先级（已转小写），数值越小越优先
+_WEBSITE_PRIORITY_RANK = {
+    title: rank
+    for rank, title in enumerate(("homepage", "官网", "官方网站", "official website"))
+}
+
+
+def pick_org_website(websites: List[Dict[str, Any]]) -> str:
+    """
+    从会社 ``website`` 列表中按标题优先级选出官网地址。
+
+    单次遍历：每个条目只做一次 ``lower()`` 与一次字典查找；
+    均未命中时回退到第一个条目的链接。
+    """
+    best_rank = len(_WEBSITE_PRIORITY_RANK)
+    best_link = ""
+    for site in websites:
+        link = site.get("link", "")
+        rank = _WEBSITE_PRIORITY_RANK.get(site.get("title", "").lower(), best_rank)
+        if rank < best_rank and link:
+            best_rank, best_link = rank, link
+            if rank == 0:
+                break
+    if not best_link and websites:
+        best_link = websites[0].get("link", "")
+    return best_link
 
 
 class YMGalAPIClient:
     """月幕游戏API客户端"""
     
-    def __init__(self):
+    TOKEN_TTL = 3600            # token 有效期（秒）
+    TOKEN_REFRESH_MARGIN = 60   # 提前刷新的余量（秒）
+    SEARCH_CACHE_SIZE = 50_000  # 内存中最多缓存的关键词数
+    
+    # 每次请求都相同的查询参数 / 请求头，只在调用时补上 keyword 与 token
+    _SEARCH_PARAMS = {
+        "mode": "list",
+        "pageNum": 1,
+        "pageSize": 20,
+        "includeOrg": "true"
+    }
+    _BASE_HEADERS = {
+        "Accept": "application/json",
+        "version": "1"
+    }
+    HTTP_POOL_SIZE = 64
+    
+    def __init__(self, cache_path: Optional[str] = None):
+        """
+        Args:
+            cache_path: 搜索结果持久化缓存（SQLite）路径；为 ``None`` 时只使用内存缓存
+        """
         self.base_url = "https://www.ymgal.com"
         self.client_id = ""
         self.client_secret = ""
         self.token_ref = {"value": None}
         self.logger = Logger(silent_mode=True)  # 使用静默模式
+        
+        self._search_url = f"{self.base_url}/open/archive/search-game"
+        self._archive_url = f"{self.base_url}/open/archive"
+        
+        # 复用 TCP/TLS 连接；重试由调用方自行控制，连接池层不重试
+        self._session = requests.Session()
+        self._session.headers.update(self._BASE_HEADERS)
+        adapter = HTTPAdapter(pool_connections=self.HTTP_POOL_SIZE,
+                              pool_maxsize=self.HTTP_POOL_SIZE,
+                              max_retries=Retry(total=0))
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        
+        # token 刷新互斥，避免并发 401 时重复请求 /oauth/token
+        self._token_lock = threading.Lock()
+        self._token_expiry = 0.0
+        # 随 token 刷新预先构建的鉴权头，请求时按引用复用
+        self._auth_header = MappingProxyType({})
+        
+        # 搜索结果缓存：keyword -> 解析后的全部匹配（LRU），可选落盘跨运行复用
+        self._search_cache: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._search_cache_lock = threading.Lock()
+        self._persistent_cache = QueryCache(cache_path) if cache_path else None
+        
+        # 会社详情缓存：org_id -> 详情，只缓存成功获取的结果，可选落盘跨运行复用
+        self._org_cache: Dict[str, Dict[str, Any]] = {}
+        self._org_cache_lock = threading.Lock()
+        self._org_store = QueryCache(cache_path, namespace="org_details") if cache_path else None
     
     def get_access_token(self) -> Optional[str]:
         """
@@ -31,7 +119,7 @@ class YMGalAPIClient:
             "client_secret": self.client_secret,  # 固定 client_secret，由月幕平台提供
             "scope": "public"  # 只申请公开数据权限
         }
-        response = requests.post(url, data=data)
+        response = self._session.post(url, data=data)
 
         if response.status_code == 200:
             return response.json().get("access_token")
@@ -40,7 +128,34 @@ class YMGalAPIClient:
         self.logger.log_error(f"获取 token 失败: {response.status_code}, {response.text}")
         return None
     
-    def parse_search_response(self, response: requests.Response) -> List[Dict[str, Any]]:
+    def _refresh_token(self, stale_token: Optional[str]) -> Optional[str]:
+        """
+        刷新 token，并发调用时只有一个调用方真正请求 ``/oauth/token``。
+
+        进入临界区后再次检查：若 token 已被其他调用方换成新的（不同于
+        ``stale_token`` 且未临近过期），直接复用。
+        """
+        with self._token_lock:
+            current = self.token_ref["value"]
+            if (current and current != stale_token
+                    and time.monotonic() < self._token_expiry - self.TOKEN_REFRESH_MARGIN):
+                return current
+
+            new_token = self.get_access_token()
+            if new_token:
+                self.token_ref["value"] = new_token
+                self._auth_header = MappingProxyType({"Authorization": f"Bearer {new_token}"})
+                self._token_expiry = time.monotonic() + self.TOKEN_TTL
+            return new_token
+    
+    def _ensure_token(self) -> Optional[str]:
+        """返回可用 token；临近过期时提前刷新，使 401 重试很少发生。"""
+        token = self.token_ref["value"]
+        if token and time.monotonic() < self._token_expiry - self.TOKEN_REFRESH_MARGIN:
+            return token
+        return self._refresh_token(token)
+    
+    def parse_search_response(self, response: requests.Response) -> Optional[List[Dict[str, Any]]]:
         """
         解析 *search-game* 接口返回，提取游戏及其会社信息。
 
@@ -51,8 +166,8 @@ class YMGalAPIClient:
 
         Returns
         -------
-        list[dict]
-            解析后的结果列表，每个元素均包含：
+        list[dict] | None
+            响应无法解析（非 JSON、结构异常）时为 ``None``；否则为解析后的结果列表，每个元素均包含：
             - ``name``：日文 / 英文原名
             - ``chineseName``：中文名(可能为空)
             - ``ym_id``：月幕游戏 ID
@@ -60,50 +175,109 @@ class YMGalAPIClient:
             - ``orgId`` / ``orgName`` / ``orgWebsite`` / ``orgDescription``：会社信息
         """
         try:
-            response_data = response.json()
+            response_data = orjson.loads(response.content)
             # 将API响应保存到日志文件
             self.logger.log_api_response("search_game", response_data)
             results = response_data.get("data", {}).get("result", [])
         except Exception as exc:
             self.logger.log_error(f"解析 response 失败：{exc}")
+            return None
+
+        # 未命中（冷门作品常见）时直接返回，跳过后续解析
+        if not results:
             return []
+        if not isinstance(results, list):
+            self.logger.log_error(f"解析 response 失败：result 字段类型异常（{type(results).__name__}）")
+            return None
 
+        # 完整响应已记录在 search_game 日志中，逐条会社记录仅在非静默模式下输出
+        silent = self.logger.silent_mode
         parsed: List[Dict[str, Any]] = []
         for item in results:
+            get = item.get
+
             # 1️⃣ 解析匹配分数，默认 0.0
             try:
-                score = float(item.get("score", 0))
+                score = float(get("score", 0))
             except (ValueError, TypeError):
                 score = 0.0
 
             # 2️⃣ 解析会社信息，API 有时嵌套在 ``org``，有时散落在顶层
-            org_info = item.get("org", {}) or {
-                "id": item.get("orgId", ""),
-                "name": item.get("orgName", ""),
-                "website": item.get("orgWebsite", ""),
-                "description": item.get("orgDescription", "")
-            }
-
-            # 移除会社信息的INFO输出，只记录到日志文件
-            if org_info:
+            org = get("org")
+            if org:
+                org_id, org_name = org.get("id", ""), org.get("name", "")
+                org_website, org_description = org.get("website", ""), org.get("description", "")
+            else:
+                org_id, org_name = get("orgId", ""), get("orgName", "")
+                org_website, org_description = get("orgWebsite", ""), get("orgDescription", "")
+
+            if not silent:
                 self.logger.log_api_response("org_info_found", {
-                    "org_name": org_info.get('name', ''),
-                    "org_id": org_info.get('id', '')
+                    "org_name": org_name,
+                    "org_id": org_id
                 })
 
             parsed.append({
-                "name": item.get("name", ""),
-                "chineseName": item.get("chineseName", ""),
-                "ym_id": item.get("id", ""),
+                "name": get("name", ""),
+                "chineseName": get("chineseName", ""),
+                "ym_id": get("id", ""),
                 "score": round(score, 4),
-                "orgId": org_info.get("id", ""),
-                "orgName": org_info.get("name", ""),
-                "orgWebsite": org_info.get("website", ""),
-                "orgDescription": org_info.get("description", "")
+                "orgId": org_id,
+                "orgName": org_name,
+                "orgWebsite": org_website,
+                "orgDescription": org_description
             })
 
         return parsed
     
+    @staticmethod
+    def _cache_key(keyword: str) -> str:
+        """搜索缓存键：去掉首尾空白并忽略大小写，仅大小写 / 空白不同的关键词共用一份结果"""
+        return keyword.strip().casefold()
+    
+    def _get_cached_matches(self, keyword: str) -> Optional[List[Dict[str, Any]]]:
+        """查询搜索缓存：先查内存 LRU，再查持久化缓存"""
+        with self._search_cache_lock:
+            matches = self._search_cache.get(keyword)
+            if matches is not None:
+                self._search_cache.move_to_end(keyword)
+                return matches
+
+        if self._persistent_cache is not None:
+            matches = self._persistent_cache.get(keyword)
+            if matches is not None:
+                self._remember_matches(keyword, matches, persist=False)
+        return matches
+    
+    def is_search_cached(self, keyword: str) -> bool:
+        """``keyword`` 的搜索结果是否已在缓存中（命中时调用 ``search_ym_top_matches`` 不会发起请求）"""
+        return self._get_cached_matches(self._cache_key(keyword)) is not None
+    
+    def _remember_matches(self, keyword: str, matches: List[Dict[str, Any]],
+                          persist: bool = True) -> None:
+        """写入搜索缓存，超出容量时淘汰最久未使用的关键词"""
+        with self._search_cache_lock:
+            self._search_cache[keyword] = matches
+            self._search_cache.move_to_end(keyword)
+            if len(self._search_cache) > self.SEARCH_CACHE_SIZE:
+                self._search_cache.popitem(last=False)
+
+        if persist and self._persistent_cache is not None:
+            self._persistent_cache.set(keyword, matches)
+    
+    @staticmethod
+    def _select_top_matches(matches: List[Dict[str, Any]], top_k: int,
+                            threshold: float) -> List[Dict[str, Any]]:
+        """阈值过滤：最高分达标时只返回 1 条，否则返回前 ``top_k`` 条"""
+        if not matches:
+            return []
+
+        # 最高分达标时只需一次线性扫描
+        best = max(matches, key=_by_score)
+        if best["score"] >= threshold:
+            return [best]
+        return heapq.nlargest(top_k, matches, key=_by_score)
+    
     def search_ym_top_matches(
         self,
         keyword: str,
@@ -117,6 +291,7 @@ class YMGalAPIClient:
         --------
         - **Token 自动刷新**：若接口返回 401 则重新获取一次 token，最多重试 4 次。
         - **阈值过滤**：若最高得分 >= ``threshold`` 则只返回 1 条最优匹配。
+        - **结果缓存**：同一 *keyword*（忽略大小写与首尾空白）只请求一次，后续直接复用缓存结果。
 
         参数
         ----
@@ -132,45 +307,35 @@ class YMGalAPIClient:
         list[dict]
             解析后的匹配结果列表 (可能为空)。
         """
+        cache_key = self._cache_key(keyword)
+        cached = self._get_cached_matches(cache_key)
+        if cached is not None:
+            return self._select_top_matches(cached, top_k, threshold)
 
-        def _make_request(token: str) -> requests.Response:
-            """内部封装：携带 token 调用 search-game 接口。"""
-            url = f"{self.base_url}/open/archive/search-game"
-            params = {
-                "mode": "list",
-                "keyword": keyword,
-                "pageNum": 1,
-                "pageSize": 20,
-                "includeOrg": "true"
-            }
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "Accept": "application/json",
-                "version": "1"
-            }
-            return requests.get(url, params=params, headers=headers, timeout=10)
+        def _make_request() -> requests.Response:
+            """内部封装：携带当前鉴权头调用 search-game 接口。"""
+            params = {**self._SEARCH_PARAMS, "keyword": keyword}
+            return self._session.get(self._search_url, params=params, headers=self._auth_header, timeout=10)
 
         # --- 主流程：最多尝试 4 次 --------------------------------------------
         for attempt in range(4):
-            token = self.token_ref["value"]
-            response = _make_request(token)
+            token = self._ensure_token()
+            response = _make_request()
 
             # 1. 请求成功 -> 解析
             if response.status_code == 200:
                 matches = self.parse_search_response(response)
-                matches = sorted(matches, key=lambda x: x["score"], reverse=True)
-
-                # 阈值过滤逻辑
-                if matches and matches[0]["score"] >= threshold:
-                    return matches[:1]
-                return matches[:top_k]
+                if matches is None:
+                    # 响应体异常多为偶发错误，不缓存，下次仍会重新请求
+                    return []
+                # 空结果只留在内存中：持久化缓存没有过期时间，不能让一次未命中变成永久的“无匹配”
+                self._remember_matches(cache_key, matches, persist=bool(matches))
+                return self._select_top_matches(matches, top_k, threshold)
 
             # 2. Token 失效 -> 刷新后重试
             elif response.status_code == 401:
                 self.logger.log_important("Token 失效，正在重新获取…")
-                new_token = self.get_access_token()
-                if new_token:
-                    self.token_ref["value"] = new_token
+                if self._refresh_token(token):
                     continue
                 self.logger.log_error("重新获取 token 失败")
                 return []
@@ -188,28 +353,55 @@ class YMGalAPIClient:
         # 超出重试次数
         return []
     
+    def _get_cached_org(self, org_id: str) -> Optional[Dict[str, Any]]:
+        """查询会社详情缓存：先查内存，再查持久化缓存"""
+        with self._org_cache_lock:
+            cached = self._org_cache.get(org_id)
+        if cached is None and self._org_store is not None:
+            cached = self._org_store.get(org_id)
+            if cached is not None:
+                with self._org_cache_lock:
+                    self._org_cache[org_id] = cached
+        return cached
+    
+    def is_org_cached(self, org_id: str) -> bool:
+        """``org_id`` 的会社详情是否已在缓存中（命中时调用 ``get_organization_details`` 不会发起请求）"""
+        return self._get_cached_org(org_id) is not None
+    
     def get_organization_details(self, org_id: str) -> Optional[Dict[str, Any]]:
         """
         根据 ``org_id`` 向月幕查询会社详细资料。
 
         返回的字段包括：名称、中文名、官网、简介、成立日期等。
-        若调用失败或字段缺失，则返回 ``None``。
+        若调用失败或字段缺失，则返回 ``None``。官网与简介齐全的详情会被缓存，同一会社只请求一次；
+        信息不完整的详情不缓存，调用方重试时会重新请求。
         """
-        url = f"{self.base_url}/open/archive"
+        cached = self._get_cached_org(org_id)
+        if cached is not None:
+            return dict(cached)
+
+        result = self._fetch_organization_details(org_id)
+        if result is not None and result.get("website") and result.get("description"):
+            with self._org_cache_lock:
+                self._org_cache[org_id] = result
+            if self._org_store is not None:
+                self._org_store.set(org_id, result)
+            return dict(result)
+        return result
+    
+    def _fetch_organization_details(self, org_id: str) -> Optional[Dict[str, Any]]:
+        """请求 ``/open/archive`` 获取会社详情（不经过缓存）"""
         params = {"orgId": org_id}
-        headers = {
-            "Authorization": f"Bearer {self.token_ref['value']}",
-            "Accept": "application/json",
-            "version": "1"
-        }
+        self._ensure_token()
+        headers = self._auth_header
 
         try:
             # 移除控制台输出，只记录到日志文件
             self.logger.log_api_response("org_details_request", {"org_id": org_id})
-            response = requests.get(url, params=params, headers=headers, timeout=10)
+            response = self._session.get(self._archive_url, params=params, headers=headers, timeout=10)
 
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 # 记录公司信息API响应
                 self.logger.log_api_response(f"org_details_{org_id}", data)
                 org_data = data.get("data", {}).get("org", {})
@@ -220,16 +412,7 @@ class YMGalAPIClient:
                 # 按优先级提取官网地址，fallback 使用第一个
                 website = ""
                 if isinstance(org_data.get("website"), list):
-                    priority = ["homepage", "官网", "官方网站", "official website"]
-                    for title in priority:
-                        for site in org_data["website"]:
-                            if site.get("title", "").lower() == title.lower():
-                                website = site.get("link", "")
-                                break
-                        if website:
-                            break
-                    if not website and org_data["website"]:
-                        website = org_data["website"][0].get("link", "")
+                    website = pick_org_website(org_data["website"])
 
                 # 组装结果
                 result = {
@@ -260,5 +443,22 @@ class YMGalAPIClient:
     
     def initialize_token(self) -> bool:
         """初始化token"""
-        self.token_ref["value"] = self.get_access_token()
-        return self.token_ref["value"] is not None
\ No newline at end of file
+        return self._refresh_token(self.token_ref["value"]) is not None
+
+_client_singleton: Optional[YMGalAPIClient] = None
+_client_singleton_lock = threading.Lock()
+
+
+def get_api_client(cache_path: Optional[str] = None) -> YMGalAPIClient:
+    """
+    获取进程内共享的 :class:`YMGalAPIClient`。
+
+    所有匹配模式复用同一个实例，从而共享连接池、access_token 与搜索缓存，
+    整个进程只需一次 OAuth 请求。``cache_path`` 仅在首次创建时生效。
+    """
+    global _client_singleton
+    if _client_singleton is None:
+        with _client_singleton_lock:
+            if _client_singleton is None:
+                _client_singleton = YMGalAPIClient(cache_path=cache_path)
+    return _client_singleton
@@ -1,16 +1,37 @@
 """
 异步爬虫模块
 提供高并发异步爬取功能
+
+子模块按需加载（PEP 562），只导入实际用到的符号所在模块
 """
 
-from .async_spider_engine import AsyncSpiderEngine
-from .buffer_manager import BufferManager, BufferConfig, WriteStrategy
-from .async_matching_engine import AsyncMatchingEngine
-
-__all__ = [
-    'AsyncSpiderEngine', 
-    'BufferManager', 
-    'BufferConfig', 
-    'WriteStrategy',
-    'AsyncMatchingEngine'
-] 
\ No newline at end of file
+import importlib
+
+_LAZY = {
+    'AsyncSpiderEngine': '.async_spider_engine',
+    'BufferManager': '.buffer_manager',
+    'BufferConfig': '.buffer_manager',
+    'WriteStrategy': '.buffer_manager',
+    'AsyncMatchingEngine': '.async_matching_engine',
+    'AsyncTokenBucket': '.rate_limiter',
+    'AsyncConcurrencyLimiter': '.rate_limiter',
+    'CongestionController': '.congestion_control',
+    'CongestionStats': '.congestion_control',
+    'install_fast_event_loop': '.event_loop',
+    'run_async': '.event_loop',
+}
+
+__all__ = list(_LAZY)
+
+
+def __getattr__(name):
+    module_name = _LAZY.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
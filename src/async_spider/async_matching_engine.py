@@ -1,23 +1,59 @@
 import asyncio
 import pandas as pd
 import os
-from typing import List, Dict, Any, Optional
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from types import MappingProxyType
+from typing import List, Dict, Any, Optional, Awaitable, Tuple
 from tqdm import tqdm
 
 from .async_spider_engine import AsyncSpiderEngine
 from .buffer_manager import BufferManager, BufferConfig, WriteStrategy
 from ..data.data_processor import DataProcessor
 from ..utils.logger import Logger
+from ..utils.query_cache import QueryCache
+
+
+# 无会社详情时的占位，避免每行分配空字典
+_EMPTY_ORG = MappingProxyType({})
+
+
+def _top_score(candidate: Tuple[Dict[str, Any], str]) -> float:
+    return candidate[0]["score"]
 
 
 class AsyncMatchingEngine:
     """异步匹配引擎，整合异步爬虫和缓冲池功能"""
     
+    SEARCH_CACHE_SIZE = 50_000  # 搜索结果缓存条数上限（LRU）
+    
+    MAX_MATCH_SCORE = 1.0  # 接口匹配得分上限：原始得分已达上限时别名不可能更优
+    
+    PROGRESS_UPDATE_EVERY = 64  # 每完成多少个任务刷新一次进度条
+    
+    POSTFIX_UPDATE_INTERVAL = 1.0  # 进度条统计信息的最短刷新间隔（秒）
+    
+    MAX_TASK_RETRIES = 2      # 任务异常时的最大重试次数，超过后放弃（下次运行断点续跑时会重新处理）
+    TASK_RETRY_BACKOFF = 1.0  # 任务重试的初始退避时间（秒），每次重试翻倍
+    
+    UNMATCHED_COLUMN = "原始的未匹配bgm产品名称"  # 未匹配文件的唯一列
+    
+    # 别名匹配时保留的原始匹配列（别名未能提高分数时回写原始结果）
+    ALIAS_ORIGINAL_COLUMNS = [
+        "bgm产品", "原始bgm产品名称",
+        "name", "chineseName", "ym_id",
+        "orgId", "orgName", "orgWebsite", "orgDescription"
+    ]
+    
     def __init__(self, 
                  max_concurrent: int = 5,  # 降低默认并发数，避免503错误
-                 buffer_size: int = 500,
-                 write_interval: float = 3.0,
-                 batch_size: int = 50):  # 添加批次大小参数
+                 buffer_size: int = 1000,
+                 write_interval: float = 10.0,
+                 batch_size: int = 50,  # 添加批次大小参数
+                 exact_threshold: float = 0.95,
+                 cache_path: Optional[str] = None):
         """
         初始化异步匹配引擎
         
@@ -25,7 +61,9 @@ class AsyncMatchingEngine:
             max_concurrent: 最大并发数
             buffer_size: 缓冲区大小
             write_interval: 写入间隔（秒）
-            batch_size: 批次大小（每批处理的任务数量）
+            batch_size: 批次大小（同时在途的任务数量）
+            exact_threshold: 优先名称得分达到该值即视为命中，取消其余名称的查询
+            cache_path: 搜索结果 / 会社详情持久化缓存（SQLite）路径；为 ``None`` 时只使用内存缓存
         """
         # 初始化异步爬虫引擎
         self.spider = AsyncSpiderEngine(
@@ -35,9 +73,9 @@ class AsyncMatchingEngine:
             timeout=20          # 减少超时时间
         )
         
-        # 初始化缓冲池管理器
+        # 初始化缓冲池管理器；缓冲区至少容纳数个窗口的结果，避免窗口内频繁触发写入
         buffer_config = BufferConfig(
-            buffer_size=buffer_size,
+            buffer_size=max(buffer_size, batch_size * 4),
             write_interval=write_interval,
             strategy=WriteStrategy.HYBRID,
             auto_flush=True,
@@ -51,70 +89,111 @@ class AsyncMatchingEngine:
         # 批次大小
         self.batch_size = batch_size
         
+        # 高置信度阈值
+        self.exact_threshold = exact_threshold
+        
         # 日志记录器
         self.logger = Logger(silent_mode=True)
         
+        # 请求合并缓存：相同关键词 / 会社ID 的并发与重复查询共享同一个 Future
+        self._search_cache_size = self.SEARCH_CACHE_SIZE
+        self._search_futures: "OrderedDict[str, asyncio.Future]" = OrderedDict()
+        self._search_waiters: Dict[asyncio.Future, int] = {}
+        self._org_futures: Dict[str, asyncio.Future] = {}
+        
+        # 持久化缓存：跨运行复用已获取的搜索结果与会社详情
+        if cache_path:
+            self._search_store = QueryCache(cache_path, namespace="async_search")
+            self._org_store = QueryCache(cache_path, namespace="async_org")
+        else:
+            self._search_store = self._org_store = None
+        # 缓存写入（序列化 + SQLite 提交）交给单独的写线程，不占用事件循环；单线程保证按提交顺序写入
+        self._store_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="query-cache-writer")
+        
+        # 待写入缓冲池的结果行，按文件ID分组后批量提交
+        self._pending_rows: Dict[str, List[Dict[str, Any]]] = {}
+        
         # 统计信息
         self.processed_count = 0
         self.matched_count = 0
         self.unmatched_count = 0
+        self.failed_task_count = 0
         
 
         
     async def start(self):
         """启动异步匹配引擎"""
-        print("正在启动异步匹配引擎...")
+        self.logger.log_important(
+            f"正在启动异步匹配引擎（事件循环: {type(asyncio.get_running_loop()).__module__}）"
+        )
         
         # 启动缓冲池管理器
         await self.buffer_manager.start()
         
-        # 初始化API token
+        # 初始化API token（同时建立共享会话，预热到 API 主机的连接）
         if not await self.spider.initialize_token():
             raise Exception("无法获取API访问令牌")
         
-        print("异步匹配引擎启动完成")
+        self.logger.log_important("异步匹配引擎启动完成")
     
     async def stop(self):
         """停止异步匹配引擎"""
-        print("正在停止异步匹配引擎...")
+        self.logger.log_important("正在停止异步匹配引擎...")
         
         # 停止缓冲池管理器
         await self.buffer_manager.stop()
-        
+
+        # 关闭共享连接池
+        await self.spider.close()
+        
+        # 等待缓存写入完成后关闭持久化缓存
+        self._store_writer.shutdown(wait=True)
+        for store in (self._search_store, self._org_store):
+            if store is not None:
+                store.close()
+
         # 显示统计信息
         self._show_statistics()
         
-        print("异步匹配引擎已停止")
+        self.logger.log_important("异步匹配引擎已停止")
     
     def _show_statistics(self):
         """显示统计信息"""
         spider_stats = self.spider.get_statistics()
         buffer_stats = self.buffer_manager.get_buffer_status()
         
-        print("\n=== 异步处理统计信息 ===")
-        print(f"处理总数: {self.processed_count}")
-        print(f"匹配成功: {self.matched_count}")
-        print(f"匹配失败: {self.unmatched_count}")
-        print(f"成功率: {self.matched_count / max(self.processed_count, 1) * 100:.2f}%")
-        
-        print(f"\nAPI请求统计:")
-        print(f"  总请求数: {spider_stats['total_requests']}")
-        print(f"  成功请求: {spider_stats['successful_requests']}")
-        print(f"  失败请求: {spider_stats['failed_requests']}")
-        print(f"  成功率: {spider_stats['success_rate'] * 100:.2f}%")
-        print(f"  503错误数: {spider_stats['total_503_errors']}")
-        print(f"  连续503错误: {spider_stats['consecutive_503_errors']}")
-        
-        print(f"\n缓冲池统计:")
-        print(f"  总写入次数: {buffer_stats['total_writes']}")
-        print(f"  总数据项: {buffer_stats['total_items']}")
-    
-    async def match_bgm_products_async(
+        # 汇总为一条日志输出，避免逐行写控制台
+        lines = [
+            "",
+            "=== 异步处理统计信息 ===",
+            f"处理总数: {self.processed_count}",
+            f"匹配成功: {self.matched_count}",
+            f"匹配失败: {self.unmatched_count}",
+            f"任务异常放弃: {self.failed_task_count}",
+            f"成功率: {self.matched_count / max(self.processed_count, 1) * 100:.2f}%",
+            "",
+            "API请求统计:",
+            f"  总请求数: {spider_stats['total_requests']}",
+            f"  成功请求: {spider_stats['successful_requests']}",
+            f"  失败请求: {spider_stats['failed_requests']}",
+            f"  成功率: {spider_stats['success_rate'] * 100:.2f}%",
+            f"  503错误数: {spider_stats['total_503_errors']}",
+            f"  连续503错误: {spider_stats['consecutive_503_errors']}",
+            f"  当前并发窗口: {spider_stats['concurrency_window']}",
+            "",
+            "缓冲池统计:",
+            f"  总写入次数: {buffer_stats['total_writes']}",
+            f"  总数据项: {buffer_stats['total_items']}",
+        ]
+        self.logger.log_important("\n".join(lines))
+    
+    async def match_bgm_games_async(
         self,
         input_file: str,
         output_file: str = "save/products_matched_async.xlsx",
         unmatched_file: str = "save/products_unmatched_async.xlsx",
-        org_output_file: str = "save/organizations_info_async.xlsx"
+        org_output_file: str = "save/organizations_info_async.xlsx",
+        df_bgm: Optional[pd.DataFrame] = None
     ) -> None:
         """
         异步匹配原始产品数据
@@ -123,28 +202,17 @@ class AsyncMatchingEngine:
             output_file: 匹配结果输出文件
             unmatched_file: 未匹配结果输出文件
             org_output_file: 公司信息输出文件
+            df_bgm: 已读取的源表；提供时不再解析 ``input_file``
         """
         # 确保输出目录存在
         os.makedirs("save", exist_ok=True)
         
         # 注册输出文件到缓冲池
-        matched_columns = [
-            "bgm_id", "bgm产品",
-            "name", "chineseName", "ym_id", "score",
-            "orgId", "orgName", "orgWebsite", "orgDescription",
-            "匹配来源"
-        ]
-        
-        org_columns = [
-            "org_id", "name", "chineseName", "website", "description", "birthday"
-        ]
+        self._register_outputs(output_file, unmatched_file, org_output_file)
         
-        self.buffer_manager.register_file("matched", output_file, matched_columns)
-        self.buffer_manager.register_file("unmatched", unmatched_file, ["原始的未匹配bgm产品名称"])
-        self.buffer_manager.register_file("org", org_output_file, org_columns)
-        
-        # 读取输入数据
-        df_bgm = self.data_processor.read_bgm_data(input_file)
+        # 读取输入数据（只解析构建任务用到的列）
+        if df_bgm is None:
+            df_bgm = self.data_processor.read_bgm_data(input_file, columns=("id", "日文名", "中文名"))
         
         # 获取已处理的ID（断点续传）
         processed_ids = self.data_processor.get_processed_ids(output_file)
@@ -152,138 +220,344 @@ class AsyncMatchingEngine:
         # 获取已处理的公司信息
         processed_orgs = self.data_processor.get_processed_orgs(org_output_file)
         
-        # 创建任务列表
-        tasks = []
-        for idx, row in df_bgm.iterrows():
-            bgm_id = str(row['id']) if 'id' in row and pd.notna(row['id']) else f"ROW_{idx}"
-            
-            if bgm_id in processed_ids:
-                continue
-            
-            jp_name = str(row["日文名"]).strip() if pd.notna(row["日文名"]) else ""
-            cn_name = str(row["中文名"]).strip() if pd.notna(row["中文名"]) else ""
-            
-            if not jp_name and not cn_name:
-                continue
-            
-            tasks.append({
-                "id": bgm_id,
-                "jp_name": jp_name,
-                "cn_name": cn_name,
-                "row_index": idx
-            })
+        # 创建任务列表（按列向量化构建，避免逐行 iterrows）
+        bgm_ids = self.data_processor.bgm_id_column(df_bgm, "id")
+        jp_names = self.data_processor.text_column(df_bgm, "日文名")
+        cn_names = self.data_processor.text_column(df_bgm, "中文名")
+        
+        mask = ~bgm_ids.isin(processed_ids) & (jp_names.ne("") | cn_names.ne(""))
+        tasks = pd.DataFrame({
+            "id": bgm_ids,
+            "jp_name": jp_names,
+            "cn_name": cn_names,
+            "row_index": df_bgm.index
+        }, index=df_bgm.index)[mask].to_dict("records")
+        
+        # 任务已包含所需字段，处理期间不再持有整张源表
+        del df_bgm, bgm_ids, jp_names, cn_names, mask
         
         # 批量处理任务
         await self._process_tasks_batch(tasks, processed_orgs)
     
+    def _register_outputs(self, output_file: str, unmatched_file: str, org_output_file: str):
+        """注册匹配结果 / 未匹配 / 会社信息三个输出文件到缓冲池"""
+        self.buffer_manager.register_file("matched", output_file, DataProcessor.EXCEL_COLUMNS_MATCHED,
+                                          id_column="bgm_id",
+                                          id_log_path=DataProcessor.processed_ids_log(output_file))
+        self.buffer_manager.register_file("unmatched", unmatched_file, [self.UNMATCHED_COLUMN])
+        self.buffer_manager.register_file("org", org_output_file, DataProcessor.EXCEL_COLUMNS_ORG)
+    
+    @staticmethod
+    def _matched_row(bgm_id: str, product: str, match: Dict[str, Any], score: float,
+                     org_id: Any, org_info: Optional[Dict[str, Any]], source: str) -> Dict[str, Any]:
+        """构建一行匹配结果；有会社详情时优先使用详情中的名称 / 官网 / 简介"""
+        get = match.get
+        org_get = (org_info or _EMPTY_ORG).get
+        return {
+            "bgm_id": bgm_id,
+            "bgm产品": product,
+            "name": get("name"),
+            "chineseName": get("chineseName"),
+            "ym_id": get("ym_id"),
+            "score": score,
+            "orgId": org_id,
+            "orgName": org_get("name", get("orgName", "")),
+            "orgWebsite": org_get("website", get("orgWebsite", "")),
+            "orgDescription": org_get("description", get("orgDescription", "")),
+            "匹配来源": source
+        }
+    
+    def _queue_unmatched(self, bgm_id: str) -> Dict:
+        """记录未匹配的产品，返回任务结果"""
+        unmatched_data = {self.UNMATCHED_COLUMN: f"ID_{bgm_id}_未匹配"}
+        self._queue_row("unmatched", unmatched_data)
+        return {"matched": False, "data": unmatched_data}
+    
     async def _process_tasks_batch(self, tasks: List[Dict], processed_orgs: Dict):
         """批量处理任务"""
-        print(f"开始处理 {len(tasks)} 个任务，批次大小: {self.batch_size}")
-        
-        # 创建进度条
-        pbar = tqdm(total=len(tasks), desc="异步处理产品", unit="个")
+        self.logger.log_important(f"开始处理 {len(tasks)} 个任务，批次大小: {self.batch_size}")
+        self._plan_queries(name for task in tasks for name in (task["jp_name"], task["cn_name"]) if name)
+        await self._run_task_pipeline(tasks, self._process_single_task, processed_orgs, "异步处理产品")
+    
+    def _plan_queries(self, keywords):
+        """
+        统计整个任务集去重后的查询数，并保证搜索缓存能容纳全部不同关键词，
+        使每个关键词在本次运行中至多请求一次
+        """
+        total = 0
+        unique = set()
+        for keyword in keywords:
+            total += 1
+            unique.add(keyword.casefold().strip())
+        
+        self._search_cache_size = max(self.SEARCH_CACHE_SIZE, len(unique))
+        self.logger.log_important(f"查询关键词: 共 {total} 个，去重后 {len(unique)} 个")
+    
+    async def _run_task_pipeline(self, tasks: List[Dict], worker, processed_orgs: Dict, desc: str):
+        """
+        滑动窗口方式执行任务：最多 ``batch_size`` 个任务同时在途，
+        任一任务完成即补入下一个，避免整批等待最慢的请求
+        """
+        pbar = tqdm(total=len(tasks), desc=desc, unit="个", mininterval=0.5)
+        task_iter = iter(tasks)
+        pending = set()
+        attempts: Dict[asyncio.Future, Tuple[Dict, int]] = {}  # 在途任务 -> (任务, 已重试次数)
+        retry_queue = deque()  # 异常待重试的 (任务, 重试次数)，新任务全部提交后再处理
+        unreported = 0  # 已完成但尚未计入进度条的任务数
+        last_postfix = float("-inf")
+        
+        async def run_retry(task: Dict, attempt: int):
+            # 指数退避后重试，给接口恢复的时间
+            await asyncio.sleep(self.TASK_RETRY_BACKOFF * 2 ** (attempt - 1))
+            return await worker(task, processed_orgs)
+        
+        def submit_next() -> bool:
+            task = next(task_iter, None)
+            if task is not None:
+                attempt = 0
+                future = asyncio.ensure_future(worker(task, processed_orgs))
+            elif retry_queue:
+                task, attempt = retry_queue.popleft()
+                future = asyncio.ensure_future(run_retry(task, attempt))
+            else:
+                return False
+            pending.add(future)
+            attempts[future] = (task, attempt)
+            return True
+        
+        def report_progress(force: bool = False):
+            nonlocal last_postfix
+            pbar.update(unreported)
+            # 统计信息按时间间隔刷新，不随每次进度更新重建
+            now = time.monotonic()
+            if not force and now - last_postfix < self.POSTFIX_UPDATE_INTERVAL:
+                return
+            last_postfix = now
+            pbar.set_postfix({
+                '在途': len(pending),
+                '已处理': self.processed_count,
+                '成功': self.matched_count,
+                '失败': self.unmatched_count
+            }, refresh=False)
         
         try:
-            for i in range(0, len(tasks), self.batch_size):
-                batch = tasks[i:i + self.batch_size]
-                batch_num = i // self.batch_size + 1
-                total_batches = (len(tasks) + self.batch_size - 1) // self.batch_size
-                
-                # 创建协程任务
-                coroutines = [self._process_single_task(task, processed_orgs) for task in batch]
-                
-                # 并发执行
-                results = await asyncio.gather(*coroutines, return_exceptions=True)
+            for _ in range(self.batch_size):
+                if not submit_next():
+                    break
+            
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                pending.difference_update(done)
                 
-                # 处理结果
-                batch_processed = 0
-                for result in results:
-                    if not isinstance(result, Exception):
-                        self.processed_count += 1
-                        batch_processed += 1
-                        if result.get("matched"):
-                            self.matched_count += 1
+                for future in done:
+                    task, attempt = attempts.pop(future)
+                    if future.cancelled() or future.exception() is not None:
+                        if attempt < self.MAX_TASK_RETRIES:
+                            retry_queue.append((task, attempt + 1))
                         else:
-                            self.unmatched_count += 1
-                        # 更新进度条
-                        pbar.update(1)
+                            self.failed_task_count += 1
+                            unreported += 1
+                            self.logger.log_error_throttled(
+                                "task_failed", f"任务 {task.get('id')} 重试 {attempt} 次后仍失败，已放弃"
+                            )
+                        submit_next()
+                        continue
+                    
+                    submit_next()
+                    result = future.result()
+                    self.processed_count += 1
+                    if result.get("matched"):
+                        self.matched_count += 1
+                    else:
+                        self.unmatched_count += 1
+                    unreported += 1
+                
+                if sum(map(len, self._pending_rows.values())) >= self.batch_size:
+                    await self._flush_pending_rows()
                 
-                # 显示批次信息
-                pbar.set_postfix({
-                    '批次': f'{batch_num}/{total_batches}',
-                    '已处理': self.processed_count,
-                    '成功': self.matched_count,
-                    '失败': self.unmatched_count
-                })
+                # 批量更新进度条，避免每个任务都触发 tqdm 刷新
+                if unreported >= self.PROGRESS_UPDATE_EVERY:
+                    report_progress()
+                    unreported = 0
         finally:
+            for future in pending:
+                future.cancel()
+            await self._flush_pending_rows()
+            report_progress(force=True)
             pbar.close()
     
+    def _queue_row(self, file_id: str, data: Dict[str, Any]):
+        """暂存一行结果，由 ``_flush_pending_rows`` 批量提交到缓冲池"""
+        self._pending_rows.setdefault(file_id, []).append(data)
+    
+    async def _flush_pending_rows(self):
+        """将暂存的结果按文件一次性提交到缓冲池"""
+        pending_rows, self._pending_rows = self._pending_rows, {}
+        for file_id, rows in pending_rows.items():
+            if rows:
+                await self.buffer_manager.put_batch_data(file_id, rows)
+    
+    @staticmethod
+    def _is_reusable(future: asyncio.Future) -> bool:
+        """进行中或已成功完成的 Future 可复用；取消或异常的需要重新发起"""
+        return not future.done() or (not future.cancelled() and future.exception() is None)
+    
+    @staticmethod
+    def _pick_best(candidates: List[Tuple[List[Dict[str, Any]], str]]) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        从各名称的查询结果中取首条得分最高者，返回 ``(最佳匹配, 匹配来源)``；
+        分数相同时取靠前的候选，均无结果时返回 ``(None, "")``
+        """
+        best = max(((matches[0], source) for matches, source in candidates if matches),
+                   key=_top_score, default=None)
+        return best if best else (None, "")
+    
+    @staticmethod
+    async def _no_matches() -> List[Dict[str, Any]]:
+        """名称为空时的占位查询"""
+        return []
+    
+    def _search(self, keyword: str) -> "asyncio.Task[List[Dict[str, Any]]]":
+        """搜索游戏，相同关键词（忽略大小写与首尾空白）只请求一次"""
+        key = keyword.casefold().strip()
+        future = self._search_futures.get(key)
+        if future is not None and self._is_reusable(future):
+            self._search_futures.move_to_end(key)
+        else:
+            future = asyncio.ensure_future(self._fetch_search(keyword, key))
+            self._search_futures[key] = future
+            if len(self._search_futures) > self._search_cache_size:
+                self._search_futures.popitem(last=False)
+        
+        self._search_waiters[future] = self._search_waiters.get(future, 0) + 1
+        waiter = asyncio.ensure_future(self._wait_search(future))
+        # 计数在等待任务结束时（含尚未开始执行就被取消）由回调扣减，不依赖 _wait_search 运行到 finally
+        waiter.add_done_callback(lambda task: self._release_search(future, task))
+        return waiter
+    
+    async def _fetch_search(self, keyword: str, key: str) -> List[Dict[str, Any]]:
+        """先查持久化缓存，未命中再请求接口；非空结果写回缓存（空结果可能是请求失败，不缓存）"""
+        if self._search_store is not None:
+            matches = self._search_store.get(key)
+            if matches is not None:
+                return matches
+        
+        matches = await self.spider.search_game_async(keyword)
+        if matches and self._search_store is not None:
+            self._store_writer.submit(self._search_store.set, key, matches)
+        return matches
+    
+    async def _wait_search(self, future: asyncio.Future) -> List[Dict[str, Any]]:
+        """等待共享的搜索请求"""
+        # shield：单个调用方被取消时不影响共享同一请求的其他任务
+        return await asyncio.shield(future)
+    
+    def _release_search(self, future: asyncio.Future, waiter: asyncio.Future):
+        """
+        等待任务结束时扣减共享请求的等待数。调用方被取消且已无其他任务等待该请求时，
+        一并取消底层请求（尚在排队时就不会再发出）
+        """
+        remaining = self._search_waiters.get(future, 1) - 1
+        if remaining:
+            self._search_waiters[future] = remaining
+            return
+        self._search_waiters.pop(future, None)
+        if waiter.cancelled():
+            future.cancel()
+    
+    def _is_exact(self, matches: List[Dict[str, Any]]) -> bool:
+        """首条结果得分达到高置信度阈值"""
+        return bool(matches) and matches[0]["score"] >= self.exact_threshold
+    
+    async def _first_exact_or_all(self, searches: List[Awaitable]) -> List[List[Dict[str, Any]]]:
+        """
+        按优先级依次等待已并发发出的查询；某个结果达到高置信度阈值时，
+        取消其后的查询，其结果按空处理
+        """
+        results = []
+        try:
+            for search in searches:
+                matches = await search
+                results.append(matches)
+                if self._is_exact(matches):
+                    break
+        finally:
+            # 命中或出错时，取消尚未等待的查询
+            for rest in searches[len(results):]:
+                rest.cancel()
+        results.extend([] for _ in range(len(searches) - len(results)))
+        return results
+    
+    def _org_details_future(self, org_id: str, processed_orgs: Dict) -> asyncio.Future:
+        """
+        获取会社详情的共享 Future（single-flight），未获取到结果时允许后续重试。
+        结果由创建该 Future 时挂上的回调统一登记，保证同一会社只写入一次
+        """
+        future = self._org_futures.get(org_id)
+        if future is None or not self._is_reusable(future) or (future.done() and future.result() is None):
+            future = asyncio.ensure_future(self._fetch_org(org_id))
+            future.add_done_callback(partial(self._record_org, org_id, processed_orgs))
+            self._org_futures[org_id] = future
+        return future
+    
+    async def _fetch_org(self, org_id: str) -> Optional[Dict[str, Any]]:
+        """先查持久化缓存，未命中再请求会社详情；获取成功的结果写回缓存"""
+        if self._org_store is not None:
+            org_info = self._org_store.get(org_id)
+            if org_info is not None:
+                return org_info
+        
+        org_info = await self.spider.get_organization_details_async(org_id)
+        if org_info and self._org_store is not None:
+            self._store_writer.submit(self._org_store.set, org_id, org_info)
+        return org_info
+    
+    def _record_org(self, org_id: str, processed_orgs: Dict, future: asyncio.Future):
+        """会社详情请求完成回调：新会社登记到 processed_orgs 并写入会社输出文件"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        org_info = future.result()
+        if org_info and org_id not in processed_orgs:
+            processed_orgs[org_id] = {"info": org_info, "retry_count": 0}
+            # 详情中的会社 ID 键为 "id"，输出文件的列为 "org_id"
+            self._queue_row("org", {"org_id": org_id, **org_info})
+    
+    async def _resolve_org(self, org_id: str, processed_orgs: Dict) -> Optional[Dict[str, Any]]:
+        """获取会社信息，已知会社直接返回，并发请求同一会社时共享一次请求"""
+        if org_id in processed_orgs:
+            return processed_orgs[org_id]["info"]
+        return await asyncio.shield(self._org_details_future(org_id, processed_orgs))
+    
     async def _process_single_task(self, task: Dict, processed_orgs: Dict) -> Dict:
         """处理单个产品任务"""
         bgm_id = task["id"]
         jp_name = task["jp_name"]
         cn_name = task["cn_name"]
         
-        best_match = None
-        best_score = -1.0
-        match_source = ""
-        
-        # 尝试匹配日文名
-        if jp_name:
-            jp_matches = await self.spider.search_game_async(jp_name)
-            if jp_matches and jp_matches[0]["score"] > best_score:
-                best_match = jp_matches[0]
-                best_score = best_match["score"]
-                match_source = "日文名"
-        
-        # 尝试匹配中文名
-        if cn_name:
-            cn_matches = await self.spider.search_game_async(cn_name)
-            if cn_matches and cn_matches[0]["score"] > best_score:
-                best_match = cn_matches[0]
-                best_score = best_match["score"]
-                match_source = "中文名"
+        # 日文名与中文名同时查询，分数相同时优先日文名；日文名高置信度命中时不再等待中文名
+        jp_matches, cn_matches = await self._first_exact_or_all([
+            self._search(jp_name) if jp_name else asyncio.ensure_future(self._no_matches()),
+            self._search(cn_name) if cn_name else asyncio.ensure_future(self._no_matches())
+        ])
+        
+        best_match, match_source = self._pick_best([(jp_matches, "日文名"), (cn_matches, "中文名")])
         
         if best_match:
             # 处理会社信息
             org_id = str(best_match.get("orgId", ""))
-            org_info = None
-            
-            if org_id:
-                if org_id in processed_orgs:
-                    org_info = processed_orgs[org_id]["info"]
-                else:
-                    org_info = await self.spider.get_organization_details_async(org_id)
-                    if org_info:
-                        processed_orgs[org_id] = {"info": org_info, "retry_count": 0}
-                        await self.buffer_manager.put_data("org", org_info)
+            org_info = await self._resolve_org(org_id, processed_orgs) if org_id else None
             
             # 准备匹配结果数据
-            matched_data = {
-                "bgm_id": bgm_id,
-                "bgm产品": jp_name if jp_name else cn_name,
-                "name": best_match["name"],
-                "chineseName": best_match["chineseName"],
-                "ym_id": best_match["ym_id"],
-                "score": best_match["score"],
-                "orgId": org_id,
-                "orgName": (org_info or {}).get("name", best_match.get("orgName", "")),
-                "orgWebsite": (org_info or {}).get("website", best_match.get("orgWebsite", "")),
-                "orgDescription": (org_info or {}).get("description", best_match.get("orgDescription", "")),
-                "匹配来源": match_source
-            }
-            
-            await self.buffer_manager.put_data("matched", matched_data)
+            matched_data = self._matched_row(bgm_id, jp_name if jp_name else cn_name, best_match,
+                                             best_match["score"], org_id, org_info, match_source)
+            self._queue_row("matched", matched_data)
             
             return {"matched": True, "data": matched_data}
         else:
             # 记录未匹配
-            unmatched_data = {"原始的未匹配bgm产品名称": f"ID_{bgm_id}_未匹配"}
-            await self.buffer_manager.put_data("unmatched", unmatched_data)
-            
-            return {"matched": False, "data": unmatched_data}
+            return self._queue_unmatched(bgm_id)
     
-    async def match_bgm_products_with_aliases_async(
+    async def match_bgm_games_with_aliases_async(
         self,
         input_file: str,
         output_file: str = "save/products_matched_aliases_async.xlsx",
@@ -297,18 +571,7 @@ class AsyncMatchingEngine:
         os.makedirs("save", exist_ok=True)
         
         # 注册输出文件到缓冲池
-        matched_columns = [
-            "bgm_id", "bgm产品", "name", "chineseName", "ym_id", "score",
-            "orgId", "orgName", "orgWebsite", "orgDescription", "匹配来源"
-        ]
-        
-        org_columns = [
-            "org_id", "name", "chineseName", "website", "description", "birthday"
-        ]
-        
-        self.buffer_manager.register_file("matched", output_file, matched_columns)
-        self.buffer_manager.register_file("unmatched", unmatched_file, ["原始的未匹配bgm产品名称"])
-        self.buffer_manager.register_file("org", org_output_file, org_columns)
+        self._register_outputs(output_file, unmatched_file, org_output_file)
         
         # 读取输入数据
         df_bgm = self.data_processor.read_bgm_data_with_aliases(input_file)
@@ -319,75 +582,56 @@ class AsyncMatchingEngine:
         # 获取已处理的公司信息
         processed_orgs = self.data_processor.get_processed_orgs(org_output_file)
         
-        # 创建任务列表
-        tasks = []
-        for idx, row in df_bgm.iterrows():
-            bgm_id = str(row['bgm_id']) if 'bgm_id' in row and pd.notna(row['bgm_id']) else f"ROW_{idx}"
-            
-            if bgm_id in processed_ids:
-                continue
-            
-            # 获取别名列表
-            alias_cols = [col for col in row.index if col.startswith("别名")]
-            aliases = [str(row[col]).strip() for col in alias_cols if pd.notna(row[col]) and str(row[col]).strip()]
-            
-            if not aliases:
-                continue
-            
-            # 获取原始分数
-            original_score = 0.0
-            if 'score' in row and pd.notna(row['score']):
-                try:
-                    original_score = float(row['score'])
-                except (ValueError, TypeError):
-                    pass
-            
-            tasks.append({
+        # 创建任务列表（按列向量化构建，避免逐行 iterrows）
+        bgm_ids = self.data_processor.bgm_id_column(df_bgm, "bgm_id")
+        
+        # 别名列：去空白后非空的单元格才算有效别名
+        alias_cols = [col for col in df_bgm.columns if str(col).startswith("别名")]
+        alias_values = df_bgm[alias_cols].fillna("").astype(str).apply(lambda col: col.str.strip())
+        alias_valid = alias_values.ne("")
+        
+        # 原始分数，无法解析的按 0.0 处理
+        if "score" in df_bgm.columns:
+            original_scores = pd.to_numeric(df_bgm["score"], errors="coerce").fillna(0.0)
+        else:
+            original_scores = pd.Series(0.0, index=df_bgm.index)
+        
+        mask = (~bgm_ids.isin(processed_ids) & alias_valid.any(axis=1)).to_numpy()
+        values = alias_values.to_numpy()[mask]
+        valid = alias_valid.to_numpy()[mask]
+        
+        tasks = [
+            {
                 "id": bgm_id,
-                "aliases": aliases,
+                "aliases": row_values[row_valid].tolist(),
                 "original_score": original_score,
-                "original_data": row.to_dict(),
+                "original_data": original_data,
                 "row_index": idx
-            })
+            }
+            for bgm_id, row_values, row_valid, original_score, original_data, idx in zip(
+                bgm_ids[mask].tolist(),
+                values,
+                valid,
+                original_scores[mask].tolist(),
+                df_bgm.loc[mask, df_bgm.columns.intersection(self.ALIAS_ORIGINAL_COLUMNS)]
+                      .reindex(columns=self.ALIAS_ORIGINAL_COLUMNS).fillna("").to_dict("records"),
+                df_bgm.index[mask].tolist()
+            )
+        ]
+        
+        # 任务已包含所需字段，处理期间不再持有整张源表
+        del df_bgm, bgm_ids, alias_values, alias_valid, original_scores, values, valid
         
         # 批量处理任务
         await self._process_alias_tasks_batch(tasks, processed_orgs)
     
     async def _process_alias_tasks_batch(self, tasks: List[Dict], processed_orgs: Dict):
         """批量处理别名任务"""
-        print(f"开始处理 {len(tasks)} 个任务（别名匹配），批次大小: {self.batch_size}")
-        
-        # 创建进度条
-        pbar = tqdm(total=len(tasks), desc="异步处理产品（别名匹配）", unit="个")
-        
-        try:
-            for i in range(0, len(tasks), self.batch_size):
-                batch = tasks[i:i + self.batch_size]
-                batch_num = i // self.batch_size + 1
-                total_batches = (len(tasks) + self.batch_size - 1) // self.batch_size
-                
-                coroutines = [self._process_single_alias_task(task, processed_orgs) for task in batch]
-                results = await asyncio.gather(*coroutines, return_exceptions=True)
-                
-                for result in results:
-                    if not isinstance(result, Exception):
-                        self.processed_count += 1
-                        if result.get("matched"):
-                            self.matched_count += 1
-                        else:
-                            self.unmatched_count += 1
-                        # 更新进度条
-                        pbar.update(1)
-                
-                # 显示批次信息
-                pbar.set_postfix({
-                    '批次': f'{batch_num}/{total_batches}',
-                    '已处理': self.processed_count,
-                    '成功': self.matched_count,
-                    '失败': self.unmatched_count
-                })
-        finally:
-            pbar.close()
+        self.logger.log_important(f"开始处理 {len(tasks)} 个任务（别名匹配），批次大小: {self.batch_size}")
+        self._plan_queries(alias for task in tasks if task["original_score"] < self.MAX_MATCH_SCORE
+                           for alias in task["aliases"])
+        await self._run_task_pipeline(tasks, self._process_single_alias_task, processed_orgs,
+                                      "异步处理产品（别名匹配）")
     
     async def _process_single_alias_task(self, task: Dict, processed_orgs: Dict) -> Dict:
         """处理单个别名任务"""
@@ -395,71 +639,37 @@ class AsyncMatchingEngine:
         aliases = task["aliases"]
         original_score = task["original_score"]
         original_data = task["original_data"]
+        product = original_data.get('bgm产品') or original_data.get('原始bgm产品名称')
         
-        best_match = None
-        best_score = -1.0
-        match_source = ""
-        
-        # 查找所有别名中的最佳匹配
-        for i, alias in enumerate(aliases):
-            matches = await self.spider.search_game_async(alias)
-            if matches and matches[0]["score"] > best_score:
-                best_match = matches[0]
-                best_score = matches[0]["score"]
-                match_source = f"别名{i+1}"
+        # 同时查询所有别名，取最佳匹配（分数相同时取靠前的别名）；
+        # 靠前的别名高置信度命中时取消其余查询。原始得分已达上限时直接沿用原始结果
+        if original_score >= self.MAX_MATCH_SCORE:
+            all_matches = []
+        else:
+            all_matches = await self._first_exact_or_all([self._search(alias) for alias in aliases])
+        best_match, match_source = self._pick_best(
+            [(matches, f"别名{i+1}") for i, matches in enumerate(all_matches)]
+        )
+        best_score = best_match["score"] if best_match else -1.0
         
         # 比较分数，决定是否使用新数据
         if best_match and best_score > original_score:
             # 处理会社信息
             org_id = str(best_match.get("orgId", ""))
-            org_info = None
-            
-            if org_id:
-                if org_id in processed_orgs:
-                    org_info = processed_orgs[org_id]["info"]
-                else:
-                    org_info = await self.spider.get_organization_details_async(org_id)
-                    if org_info:
-                        processed_orgs[org_id] = {"info": org_info, "retry_count": 0}
-                        await self.buffer_manager.put_data("org", org_info)
+            org_info = await self._resolve_org(org_id, processed_orgs) if org_id else None
             
             # 准备新匹配结果数据
-            matched_data = {
-                "bgm_id": bgm_id,
-                "bgm产品": original_data.get('bgm产品') or original_data.get('原始bgm产品名称'),
-                "name": best_match["name"],
-                "chineseName": best_match["chineseName"],
-                "ym_id": best_match["ym_id"],
-                "score": best_score,
-                "orgId": org_id,
-                "orgName": (org_info or {}).get("name", best_match.get("orgName", "")),
-                "orgWebsite": (org_info or {}).get("website", best_match.get("orgWebsite", "")),
-                "orgDescription": (org_info or {}).get("description", best_match.get("orgDescription", "")),
-                "匹配来源": match_source
-            }
-            
-            await self.buffer_manager.put_data("matched", matched_data)
+            matched_data = self._matched_row(bgm_id, product, best_match, best_score,
+                                             org_id, org_info, match_source)
+            self._queue_row("matched", matched_data)
             return {"matched": True, "data": matched_data}
         else:
             # 使用原始数据
             if original_data.get("name"):  # 如果有原始匹配结果
-                matched_data = {
-                    "bgm_id": bgm_id,
-                    "bgm产品": original_data.get('bgm产品') or original_data.get('原始bgm产品名称'),
-                    "name": original_data.get('name'),
-                    "chineseName": original_data.get('chineseName'),
-                    "ym_id": original_data.get('ym_id'),
-                    "score": original_score,
-                    "orgId": original_data.get('orgId'),
-                    "orgName": original_data.get('orgName'),
-                    "orgWebsite": original_data.get('orgWebsite'),
-                    "orgDescription": original_data.get('orgDescription'),
-                    "匹配来源": "原始数据"
-                }
-                await self.buffer_manager.put_data("matched", matched_data)
+                matched_data = self._matched_row(bgm_id, product, original_data, original_score,
+                                                 original_data.get('orgId'), None, "原始数据")
+                self._queue_row("matched", matched_data)
                 return {"matched": True, "data": matched_data}
             else:
                 # 记录未匹配
-                unmatched_data = {"原始的未匹配bgm产品名称": f"ID_{bgm_id}_未匹配"}
-                await self.buffer_manager.put_data("unmatched", unmatched_data)
-                return {"matched": False, "data": unmatched_data} 
\ No newline at end of file
+                return self._queue_unmatched(bgm_id) 
\ No newline at end of file
@@ -1,24 +1,44 @@
 import asyncio
 import aiohttp
+import heapq
+import orjson
+import random
 import time
-import json
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from operator import itemgetter
+from types import MappingProxyType
+from urllib.parse import urlencode
 from typing import List, Dict, Any, Optional, Callable
-from asyncio import Semaphore
 from tqdm import tqdm
+from yarl import URL
 
+from .congestion_control import CongestionController
+from .rate_limiter import AsyncTokenBucket, AsyncConcurrencyLimiter
+from ..api.api_client import pick_org_website
 from ..utils.logger import Logger
 
 
+# 重试退避的随机源（全抖动）
+_jitter = random.Random()
+
+_by_score = itemgetter("score")
 
 
 class AsyncSpiderEngine:
     """异步爬虫引擎，基于asyncio和aiohttp实现高并发异步爬取"""
     
+    RETRY_BACKOFF_CAP = 10.0  # 重试退避上限（秒）
+    
+    PROGRESS_UPDATE_EVERY = 32  # 批量处理时每完成多少个任务刷新一次进度条
+    
     def __init__(self, 
                  max_concurrent: int = 10,
                  request_delay: float = 0.1,
                  max_retries: int = 3,
-                 timeout: int = 30):
+                 timeout: int = 30,
+                 connector_limit: Optional[int] = None,
+                 keepalive_timeout: float = 60):
         """
         初始化异步爬虫引擎
         
@@ -27,15 +47,23 @@ class AsyncSpiderEngine:
             request_delay: 请求间隔（秒）
             max_retries: 最大重试次数
             timeout: 请求超时时间（秒）
+            connector_limit: 连接池大小，``None`` 时取 max_concurrent 的两倍，0 表示不限制
+            keepalive_timeout: 空闲长连接保留时间（秒）
         """
         self.max_concurrent = max_concurrent
         self.request_delay = request_delay
         self.max_retries = max_retries
         self.timeout = timeout
+        self.connector_limit = max_concurrent * 2 if connector_limit is None else connector_limit
+        self.keepalive_timeout = keepalive_timeout
+        # 建连单独限时，避免连不上的请求占满整个 total 时长才重试
+        self._client_timeout = aiohttp.ClientTimeout(total=timeout, connect=min(10, timeout), sock_read=timeout)
         
-        # 控制并发和限流
-        self.semaphore = Semaphore(max_concurrent)
-        self.last_request_time = 0
+        # 控制并发和限流；并发上限由拥塞控制器按 503 / 429 情况在 [1, max_concurrent] 内动态调整
+        # （慢启动 + AIMD），初始为慢启动窗口
+        self.congestion = CongestionController(max_concurrent)
+        self.semaphore = AsyncConcurrencyLimiter(self.congestion.get_current_window())
+        self.rate_limiter = AsyncTokenBucket(self._rate_for(request_delay), burst=max_concurrent)
         
         # 统计信息
         self.total_requests = 0
@@ -58,125 +86,213 @@ class AsyncSpiderEngine:
         self.client_secret = "abc114514"
         self.access_token = None
         
+        # 预构建接口 URL（含固定查询参数），请求时只替换 keyword / orgId
+        self._search_url = URL(f"{self.base_url}/open/archive/search-game").with_query({
+            "mode": "list",
+            "pageNum": 1,
+            "pageSize": 20,
+            "includeOrg": "true"
+        })
+        self._archive_url = URL(f"{self.base_url}/open/archive")
+        
+        # 凭据固定不变，token 请求体预先编码一次，刷新时直接复用
+        self._token_url = URL(f"{self.base_url}/oauth/token")
+        self._token_body = urlencode({
+            "grant_type": "client_credentials",
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "scope": "public"
+        }).encode()
+        self._token_headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        # 随 token 刷新预先构建的请求头，请求时按引用复用
+        self._auth_headers = MappingProxyType({})
+        # 进行中的 token 刷新，401 时并发请求共享同一次刷新
+        self._token_refresh: Optional[asyncio.Future] = None
+        
+        # 共享会话，整个引擎生命周期内复用连接池
+        self._session: Optional[aiohttp.ClientSession] = None
+        
+        # 会社详情缓存：同一 org_id 在引擎生命周期内只请求一次，并发请求共享同一个 Future
+        self._org_cache: Dict[str, asyncio.Future] = {}
+    
+    async def _ensure_session(self) -> aiohttp.ClientSession:
+        """懒加载共享的 ClientSession，避免每次请求重复 TCP/TLS 握手"""
+        if self._session is None or self._session.closed:
+            # 实际并发由 self.semaphore 控制；连接池只管理套接字，默认留出一倍余量，
+            # 供 token 刷新及运行中上调并发上限时使用，避免请求在连接池层面排队
+            connector = aiohttp.TCPConnector(
+                limit=self.connector_limit,
+                limit_per_host=self.connector_limit,
+                ttl_dns_cache=300,
+                keepalive_timeout=self.keepalive_timeout,
+                enable_cleanup_closed=True,
+                force_close=False
+            )
+            # 超时在会话上统一设置，各请求无需再单独传入
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self._client_timeout)
+        return self._session
+    
+    async def close(self):
+        """关闭共享会话，释放连接池"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    async def __aenter__(self) -> "AsyncSpiderEngine":
+        """进入上下文时建立共享会话，多次爬取复用同一连接池"""
+        await self._ensure_session()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+        
     async def initialize_token(self) -> bool:
-        """异步获取访问令牌"""
+        """异步获取访问令牌（复用共享会话与预编码的请求体）"""
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.base_url}/oauth/token"
-                data = {
-                    "grant_type": "client_credentials",
-                    "client_id": self.client_id,
-                    "client_secret": self.client_secret,
-                    "scope": "public"
-                }
-                
-                async with session.post(url, data=data, timeout=self.timeout) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        self.access_token = result.get("access_token")
-                        return True
-                    else:
-                        self.logger.log_error(f"获取 token 失败: {response.status}, {await response.text()}")
-                        return False
+            session = await self._ensure_session()
+            async with session.post(self._token_url, data=self._token_body,
+                                    headers=self._token_headers) as response:
+                if response.status == 200:
+                    result = orjson.loads(await response.read())
+                    self.access_token = result.get("access_token")
+                    self._auth_headers = MappingProxyType({
+                        "Authorization": f"Bearer {self.access_token}",
+                        "Accept": "application/json",
+                        "version": "1"
+                    })
+                    return True
+                else:
+                    self.logger.log_error(f"获取 token 失败: {response.status}, {await response.text()}")
+                    return False
         except Exception as e:
             self.logger.log_error(f"获取 token 异常: {e}")
             return False
     
+    async def _refresh_token(self, stale_headers) -> bool:
+        """
+        401 时刷新 token（single-flight）：并发请求共享同一次刷新；
+        请求所用的请求头已被其他协程的刷新替换时，直接用新 token 重试
+        """
+        if self._auth_headers is not stale_headers:
+            return True
+        if self._token_refresh is None or self._token_refresh.done():
+            self.logger.log_important("Token 失效，正在重新获取…")
+            self._token_refresh = asyncio.ensure_future(self.initialize_token())
+        return await asyncio.shield(self._token_refresh)
+    
+    def set_concurrency(self, limit: int):
+        """
+        运行中调整并发上限（同时作为拥塞窗口的上限），正在排队的请求按新上限放行。
+        连接池大小在会话创建时已确定，上限超过 ``connector_limit`` 时多出的请求在连接池排队
+        """
+        self.congestion.set_max_window(limit)
+        self.semaphore.set_limit(self.congestion.stats.current_cwnd)
+    
+    @staticmethod
+    def _rate_for(delay: float) -> float:
+        """请求间隔换算为令牌补充速率，间隔为 0 时不限速"""
+        return 1 / delay if delay > 0 else 0
+    
     async def _rate_limit(self):
-        """自适应限流控制"""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        
+        """自适应限流控制（令牌桶）：正常时允许 max_concurrent 个请求突发，连续503时降速并取消突发"""
         # 动态调整请求间隔，503错误时增加延迟
-        if hasattr(self, 'consecutive_503_errors'):
-            if self.consecutive_503_errors > 5:
-                # 连续503错误超过5次，大幅增加延迟
-                delay = max(self.request_delay * 3, 2.0)
-            elif self.consecutive_503_errors > 2:
-                # 连续503错误超过2次，增加延迟
-                delay = max(self.request_delay * 2, 1.0)
-            else:
-                delay = self.request_delay
+        if self.consecutive_503_errors > 5:
+            # 连续503错误超过5次，大幅增加延迟
+            self.rate_limiter.configure(self._rate_for(max(self.request_delay * 3, 2.0)), burst=1)
+        elif self.consecutive_503_errors > 2:
+            # 连续503错误超过2次，增加延迟
+            self.rate_limiter.configure(self._rate_for(max(self.request_delay * 2, 1.0)), burst=1)
         else:
-            delay = self.request_delay
-        
-        if time_since_last < delay:
-            await asyncio.sleep(delay - time_since_last)
+            self.rate_limiter.configure(self._rate_for(self.request_delay), burst=self.max_concurrent)
         
-        self.last_request_time = time.time()
+        await self.rate_limiter.acquire()
     
     async def _make_request_with_retry(self, session: aiohttp.ClientSession, 
-                                     url: str, params: Dict = None, 
+                                     url: URL, params: Dict = None, 
                                      headers: Dict = None) -> Optional[Dict]:
-        """带重试机制的异步请求"""
-        for attempt in range(self.max_retries + 1):
+        """带重试机制的异步请求；退避等待在释放并发名额后进行，不占用信号量"""
+        max_retries = self.max_retries
+        
+        for attempt in range(max_retries + 1):
+            # 指数退避 + 全抖动：在 [0, 上限) 内随机等待，避免大量协程同步重试形成冲击
+            backoff = _jitter.uniform(0, min(self.RETRY_BACKOFF_CAP, 2 ** attempt))
             try:
                 await self._rate_limit()
                 
                 async with self.semaphore:
-                    async with session.get(url, params=params, headers=headers, 
-                                         timeout=self.timeout) as response:
+                    started = time.monotonic()
+                    async with session.get(url, params=params, headers=headers) as response:
                         self.total_requests += 1
+                        status = response.status
                         
-                        if response.status == 200:
+                        if status == 200:
                             self.successful_requests += 1
-                            # 成功请求后重置503错误计数
+                            # 成功请求后重置503错误计数，并按拥塞窗口恢复并发
                             self.consecutive_503_errors = 0
-                            return await response.json()
-                        elif response.status == 401:
+                            data = orjson.loads(await response.read())
+                            self.semaphore.set_limit(self.congestion.record_success(time.monotonic() - started))
+                            return data
+                        elif status == 401:
                             # Token失效，重新获取
-                            self.logger.log_important("Token 失效，正在重新获取…")
-                            if await self.initialize_token():
-                                headers["Authorization"] = f"Bearer {self.access_token}"
+                            if await self._refresh_token(headers):
+                                headers = self._auth_headers
                                 continue
                             else:
                                 self.logger.log_error("重新获取 token 失败")
                                 self.failed_requests += 1
                                 return None
                         # 新增：403/404/410 致命错误
-                        elif response.status in (403, 404, 410):
-                            self.logger.log_error(f"接口返回致命错误: {response.status}, {await response.text()}")
-                            raise RuntimeError(f"接口返回致命错误: {response.status}")
-                        elif response.status == 503:
-                            # 503错误，增加延迟并重试
+                        elif status in (403, 404, 410):
+                            self.logger.log_error_throttled(f"status_{status}", f"接口返回致命错误: {status}, {await response.text()}")
+                            raise RuntimeError(f"接口返回致命错误: {status}")
+                        elif status in (429, 503):
+                            # 503 / 429 限流，增加延迟并重试
                             self.consecutive_503_errors += 1
-                            self.total_503_errors += 1
+                            if status == 503:
+                                self.total_503_errors += 1
+                            # 收缩拥塞窗口，降低在途请求数
+                            self.semaphore.set_limit(self.congestion.record_failure())
                             
-                            if attempt < self.max_retries:
-                                # 503错误使用更长的退避时间
-                                backoff_time = min(2 ** attempt + 1, 10)  # 最大10秒
-                                await asyncio.sleep(backoff_time)
-                                continue
-                            else:
-                                self.logger.log_error(f"503错误重试失败，已重试{self.max_retries}次")
-                                self.failed_requests += 1
-                                return None
-                        else:
-                            if attempt < self.max_retries:
-                                await asyncio.sleep(2 ** attempt)  # 指数退避
-                                continue
-                            else:
-                                self.logger.log_error(f"请求失败: {response.status}, {await response.text()}")
+                            if attempt >= max_retries:
+                                self.logger.log_error_throttled(f"status_{status}", f"{status}错误重试失败，已重试{max_retries}次")
                                 self.failed_requests += 1
                                 return None
+                            # 使用更长的退避时间；服务端给出 Retry-After 时至少等待该时长
+                            backoff = max(_jitter.uniform(0, min(self.RETRY_BACKOFF_CAP, 2 ** attempt + 1)),
+                                          self._retry_after(response.headers))
+                        elif attempt >= max_retries:
+                            self.logger.log_error_throttled(f"status_{status}", f"请求失败: {status}, {await response.text()}")
+                            self.failed_requests += 1
+                            return None
                                 
-            except asyncio.TimeoutError:
-                if attempt < self.max_retries:
-                    await asyncio.sleep(2 ** attempt)
-                    continue
-                else:
-                    self.failed_requests += 1
-                    return None
-            except Exception as e:
-                if attempt < self.max_retries:
-                    await asyncio.sleep(2 ** attempt)
-                    continue
-                else:
+            except Exception:
+                # 超时及其他异常均按退避重试
+                if attempt >= max_retries:
                     self.failed_requests += 1
                     return None
+            
+            await asyncio.sleep(backoff)
         
         return None
     
+    @staticmethod
+    def _retry_after(headers) -> float:
+        """解析 Retry-After 响应头（秒数或 HTTP 日期），缺失或无法解析时返回 0"""
+        value = headers.get("Retry-After")
+        if not value:
+            return 0.0
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return 0.0
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    
     async def search_game_async(self, keyword: str, top_k: int = 3, 
                                threshold: float = 0.8) -> List[Dict[str, Any]]:
         """异步搜索游戏"""
@@ -184,147 +300,143 @@ class AsyncSpiderEngine:
             if not await self.initialize_token():
                 return []
         
-        url = f"{self.base_url}/open/archive/search-game"
-        params = {
-            "mode": "list",
-            "keyword": keyword,
-            "pageNum": 1,
-            "pageSize": 20,
-            "includeOrg": "true"
-        }
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Accept": "application/json",
-            "version": "1"
-        }
+        url = self._search_url.update_query(keyword=keyword)
         
-        async with aiohttp.ClientSession() as session:
-            response_data = await self._make_request_with_retry(session, url, params, headers)
-            
-            if not response_data:
-                return []
-            
-            # 记录API响应到日志文件
-            self.logger.log_api_response(keyword, response_data)
-            
-            # 解析响应数据
-            results = response_data.get("data", {}).get("result", [])
-            parsed_results = []
+        session = await self._ensure_session()
+        response_data = await self._make_request_with_retry(session, url, headers=self._auth_headers)
+        
+        if not response_data:
+            return []
+        
+        # 记录API响应到日志文件
+        self.logger.log_api_response(keyword, response_data)
+        
+        # 解析响应数据；未命中或结构异常时直接返回
+        results = response_data.get("data", {}).get("result", [])
+        if not results or not isinstance(results, list):
+            return []
+        
+        # 完整响应已记录在日志中，逐条结果不再单独记录会社信息
+        parsed_results = [None] * len(results)
+        for i, item in enumerate(results):
+            get = item.get
             
-            for item in results:
+            score = get("score") or 0.0
+            if not isinstance(score, (int, float)):
                 try:
-                    score = float(item.get("score", 0))
+                    score = float(score)
                 except (ValueError, TypeError):
                     score = 0.0
-                
-                org_info = item.get("org", {}) or {
-                    "id": item.get("orgId", ""),
-                    "name": item.get("orgName", ""),
-                    "website": item.get("orgWebsite", ""),
-                    "description": item.get("orgDescription", "")
-                }
-                
-                # 记录会社信息到日志
-                if org_info:
-                    self.logger.log_api_response("org_info_found", {
-                        "org_name": org_info.get('name', ''),
-                        "org_id": org_info.get('id', '')
-                    })
-                
-                parsed_results.append({
-                    "name": item.get("name", ""),
-                    "chineseName": item.get("chineseName", ""),
-                    "ym_id": item.get("id", ""),
-                    "score": round(score, 4),
-                    "orgId": org_info.get("id", ""),
-                    "orgName": org_info.get("name", ""),
-                    "orgWebsite": org_info.get("website", ""),
-                    "orgDescription": org_info.get("description", "")
-                })
-            
-            # 排序和过滤
-            parsed_results.sort(key=lambda x: x["score"], reverse=True)
             
-            if parsed_results and parsed_results[0]["score"] >= threshold:
-                return parsed_results[:1]
+            # 会社信息有时嵌套在 ``org``，有时散落在顶层
+            org = get("org")
+            if org:
+                org_id, org_name = org.get("id", ""), org.get("name", "")
+                org_website, org_description = org.get("website", ""), org.get("description", "")
+            else:
+                org_id, org_name = get("orgId", ""), get("orgName", "")
+                org_website, org_description = get("orgWebsite", ""), get("orgDescription", "")
             
-            return parsed_results[:top_k]
+            parsed_results[i] = {
+                "name": get("name", ""),
+                "chineseName": get("chineseName", ""),
+                "ym_id": get("id", ""),
+                "score": round(score, 4),
+                "orgId": org_id,
+                "orgName": org_name,
+                "orgWebsite": org_website,
+                "orgDescription": org_description
+            }
+        
+        # 阈值过滤：最高分达标时只返回 1 条（一次线性扫描），否则返回前 top_k 条
+        best = max(parsed_results, key=_by_score)
+        if best["score"] >= threshold:
+            return [best]
+        return heapq.nlargest(top_k, parsed_results, key=_by_score)
     
     async def get_organization_details_async(self, org_id: str) -> Optional[Dict[str, Any]]:
-        """异步获取会社详细信息"""
+        """异步获取会社详细信息，结果按 org_id 缓存；获取失败（返回 ``None``）时下次调用重新请求"""
+        future = self._org_cache.get(org_id)
+        if future is None or (future.done() and (
+                future.cancelled() or future.exception() is not None or future.result() is None)):
+            future = asyncio.ensure_future(self._fetch_organization_details(org_id))
+            self._org_cache[org_id] = future
+        # 单个调用方被取消时不影响共享的请求
+        return await asyncio.shield(future)
+    
+    async def _fetch_organization_details(self, org_id: str) -> Optional[Dict[str, Any]]:
+        """请求并解析会社详情"""
         if not self.access_token:
             if not await self.initialize_token():
                 return None
         
-        url = f"{self.base_url}/open/archive"
-        params = {"orgId": org_id}
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Accept": "application/json",
-            "version": "1"
-        }
+        url = self._archive_url.with_query(orgId=org_id)
         
-        async with aiohttp.ClientSession() as session:
-            response_data = await self._make_request_with_retry(session, url, params, headers)
-            
-            if not response_data:
-                return None
-            
-            # 记录会社详情API响应到日志文件
-            self.logger.log_api_response(f"org_details_{org_id}", response_data)
-            
-            org_data = response_data.get("data", {}).get("org", {})
-            if not org_data:
-                self.logger.log_info("API 响应中未找到会社信息")
-                return None
-            
-            # 提取官网地址
-            website = ""
-            if isinstance(org_data.get("website"), list):
-                priority = ["homepage", "官网", "官方网站", "official website"]
-                for title in priority:
-                    for site in org_data["website"]:
-                        if site.get("title", "").lower() == title.lower():
-                            website = site.get("link", "")
-                            break
-                    if website:
-                        break
-                if not website and org_data["website"]:
-                    website = org_data["website"][0].get("link", "")
-            
-            return {
-                "id": org_id,
-                "name": org_data.get("name", ""),
-                "chineseName": org_data.get("chineseName", ""),
-                "website": website,
-                "description": org_data.get("introduction", ""),
-                "birthday": org_data.get("birthday", "")
-            }
+        session = await self._ensure_session()
+        response_data = await self._make_request_with_retry(session, url, headers=self._auth_headers)
+        
+        if not response_data:
+            return None
+        
+        # 记录会社详情API响应到日志文件
+        self.logger.log_api_response(f"org_details_{org_id}", response_data)
+        
+        org_data = response_data.get("data", {}).get("org", {})
+        if not org_data:
+            self.logger.log_info("API 响应中未找到会社信息")
+            return None
+        
+        # 提取官网地址（与同步客户端共用同一套优先级规则）
+        website = ""
+        if isinstance(org_data.get("website"), list):
+            website = pick_org_website(org_data["website"])
+        
+        return {
+            "id": org_id,
+            "name": org_data.get("name", ""),
+            "chineseName": org_data.get("chineseName", ""),
+            "website": website,
+            "description": org_data.get("introduction", ""),
+            "birthday": org_data.get("birthday", "")
+        }
     
     async def process_batch_async(self, tasks: List[Dict], 
                                 progress_callback: Optional[Callable] = None) -> List[Dict]:
-        """批量异步处理任务"""
-        results = []
+        """批量异步处理任务（固定数量的 worker 依次领取任务，结果按任务顺序返回）"""
+        results: List[Dict] = [None] * len(tasks)
         
-        # 创建进度条
-        pbar = tqdm(total=len(tasks), desc="异步API处理", unit="个")
+        # 创建进度条；完成数累计到 PROGRESS_UPDATE_EVERY 再统一更新，避免每个任务都触发 tqdm 刷新
+        pbar = tqdm(total=len(tasks), desc="异步API处理", unit="个", mininterval=0.5)
+        unreported = 0
+        
+        # 批次内相同查询只请求一次，后续任务等待同一个 Future（会社详情由 get_organization_details_async 自行缓存）
+        search_futures: Dict[tuple, asyncio.Future] = {}
+        
+        def shared_search(keyword: str, top_k: int, threshold: float) -> asyncio.Future:
+            key = (keyword, top_k, threshold)
+            future = search_futures.get(key)
+            if future is None:
+                future = asyncio.ensure_future(self.search_game_async(keyword, top_k=top_k, threshold=threshold))
+                search_futures[key] = future
+            return future
         
         async def process_single_task(task):
             """处理单个任务"""
+            nonlocal unreported
             try:
                 # 搜索游戏
-                search_results = await self.search_game_async(
+                # 共享结果按副本使用，补充会社信息时不影响其他任务
+                search_results = list(await shared_search(
                     task.get("keyword", ""),
-                    top_k=task.get("top_k", 3),
-                    threshold=task.get("threshold", 0.8)
-                )
+                    task.get("top_k", 3),
+                    task.get("threshold", 0.8)
+                ))
                 
                 # 获取会社信息
                 if search_results and search_results[0].get("orgId"):
-                    org_details = await self.get_organization_details_async(
-                        search_results[0]["orgId"]
-                    )
+                    org_details = await self.get_organization_details_async(search_results[0]["orgId"])
                     if org_details:
+                        search_results[0] = dict(search_results[0])
                         search_results[0].update({
                             "orgName": org_details.get("name", search_results[0].get("orgName", "")),
                             "orgWebsite": org_details.get("website", search_results[0].get("orgWebsite", "")),
@@ -348,26 +460,33 @@ class AsyncSpiderEngine:
                 }
             
             # 更新进度
-            pbar.update(1)
+            unreported += 1
+            if unreported >= self.PROGRESS_UPDATE_EVERY:
+                pbar.update(unreported)
+                unreported = 0
             if progress_callback:
                 progress_callback(result)
             
             return result
         
+        # 所有 worker 共享同一个任务迭代器，各自完成一个再领取下一个
+        pending = enumerate(tasks)
+        
+        async def worker():
+            for index, task in pending:
+                results[index] = await process_single_task(task)
+        
         try:
-            # 并发执行所有任务
-            tasks_coros = [process_single_task(task) for task in tasks]
-            results = await asyncio.gather(*tasks_coros, return_exceptions=True)
+            # 只启动 max_concurrent 个 worker，而不是为每个任务预先创建协程 / Task；
+            # 请求异常已在 process_single_task 内转为失败结果，其他异常（如回调出错）会取消其余 worker 并向上抛出
+            async with asyncio.TaskGroup() as tg:
+                for _ in range(min(self.max_concurrent, len(tasks))):
+                    tg.create_task(worker())
         finally:
+            pbar.update(unreported)
             pbar.close()
         
-        # 过滤异常结果
-        valid_results = []
-        for result in results:
-            if not isinstance(result, Exception):
-                valid_results.append(result)
-        
-        return valid_results
+        return results
     
     def get_statistics(self) -> Dict[str, Any]:
         """获取统计信息"""
@@ -378,5 +497,6 @@ class AsyncSpiderEngine:
             "success_rate": self.successful_requests / max(self.total_requests, 1),
             "retry_count": self.retry_count,
             "total_503_errors": self.total_503_errors,
-            "consecutive_503_errors": self.consecutive_503_errors
+            "consecutive_503_errors": self.consecutive_503_errors,
+            "concurrency_window": self.semaphore.limit
         } 
\ No newline at end of file
@@ -1,13 +1,89 @@
 import asyncio
+import orjson
 import pandas as pd
 import os
+import shutil
 import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
 from typing import List, Dict, Any, Optional
-from collections import deque
 from dataclasses import dataclass
 from enum import Enum
 
 
+# xlsxwriter 的 constant_memory 模式逐行流式写出，比 openpyxl 整本驻留内存快得多；
+# 未安装时回退到 openpyxl
+_HAS_XLSXWRITER = find_spec("xlsxwriter") is not None
+
+# 输出路径以 .parquet 结尾时改用列式的 Parquet 格式，写出比逐单元格生成 XML 的 Excel 快得多，需要 pyarrow
+_HAS_PYARROW = find_spec("pyarrow") is not None
+
+
+def _write_excel(df: pd.DataFrame, file_path: str) -> None:
+    """
+    整表写出 DataFrame，优先使用流式的 xlsxwriter。
+
+    constant_memory 模式下行一旦离开就被刷出，而 ``DataFrame.to_excel`` 是按列写单元格的，
+    因此这里直接按行调用 ``write_row``。
+    """
+    if not _HAS_XLSXWRITER:
+        df.to_excel(file_path, index=False)
+        return
+    
+    import xlsxwriter
+    
+    # 缺失值写为空单元格
+    rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    # 文本原样写入，不自动转换为超链接 / 公式
+    workbook = xlsxwriter.Workbook(file_path, {
+        "constant_memory": True,
+        "strings_to_urls": False,
+        "strings_to_formulas": False
+    })
+    try:
+        worksheet = workbook.add_worksheet("Sheet1")
+        worksheet.write_row(0, 0, [str(col) for col in df.columns])
+        for row_idx, row in enumerate(rows, start=1):
+            worksheet.write_row(row_idx, 0, row)
+    finally:
+        workbook.close()
+
+
+def _is_parquet(file_path: str) -> bool:
+    return file_path.lower().endswith(".parquet")
+
+
+def _write_frame(df: pd.DataFrame, file_path: str) -> None:
+    """按扩展名整表写出 Excel 或 Parquet"""
+    if _is_parquet(file_path):
+        df.to_parquet(file_path, index=False, compression="zstd")
+    else:
+        _write_excel(df, file_path)
+
+
+def _read_frame(file_path: str) -> pd.DataFrame:
+    """按扩展名读取 Excel 或 Parquet"""
+    if _is_parquet(file_path):
+        return pd.read_parquet(file_path)
+    return pd.read_excel(file_path)
+
+
+def _sibling_path(file_path: str, tag: str) -> str:
+    """同目录下的派生文件路径，保留原扩展名（如 ``a.xlsx`` -> ``a.bak.xlsx``），以便按扩展名选择写入引擎"""
+    root, ext = os.path.splitext(file_path)
+    return f"{root}{tag}{ext}"
+
+
+def _journal_path(file_path: str) -> str:
+    """增量日志（CSV）路径，如 ``a.xlsx`` -> ``a.journal.csv``"""
+    root, _ = os.path.splitext(file_path)
+    return f"{root}.journal.csv"
+
+
+def _wal_path(file_path: str) -> str:
+    """写入失败批次的暂存文件（JSON Lines）路径，如 ``a.xlsx`` -> ``a.wal``"""
+    root, _ = os.path.splitext(file_path)
+    return f"{root}.wal"
 
 
 class WriteStrategy(Enum):
@@ -17,19 +93,57 @@ class WriteStrategy(Enum):
     HYBRID = "hybrid"    # 混合策略
 
 
+class ColumnBuffer:
+    """按列存储的缓冲区（SoA）：每列一个 list，写出时直接按列构造 DataFrame"""
+    
+    __slots__ = ("columns", "data", "size")
+    
+    def __init__(self, columns: List[str]):
+        self.columns = list(columns)
+        self.data: Dict[str, list] = {col: [] for col in self.columns}
+        self.size = 0
+    
+    def __len__(self) -> int:
+        return self.size
+    
+    def append(self, row: Dict[str, Any]):
+        """追加一行，未注册的键被忽略，缺失的列记为 ``None``"""
+        for col, values in self.data.items():
+            values.append(row.get(col))
+        self.size += 1
+    
+    def extend(self, rows: List[Dict[str, Any]]):
+        """按列整体追加多行"""
+        for col, values in self.data.items():
+            values.extend([row.get(col) for row in rows])
+        self.size += len(rows)
+    
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.data, columns=self.columns)
+    
+    def clear(self):
+        self.data = {col: [] for col in self.columns}
+        self.size = 0
+
+
 @dataclass
 class BufferConfig:
     """缓冲配置"""
-    buffer_size: int = 1000          # 缓冲区大小
-    write_interval: float = 5.0      # 写入间隔（秒）
+    buffer_size: int = 1000          # 缓冲区大小（达到后立即写入）
+    write_interval: float = 10.0     # 写入间隔（秒）
     strategy: WriteStrategy = WriteStrategy.HYBRID  # 写入策略
     auto_flush: bool = True          # 自动刷新
-    backup_on_error: bool = True     # 错误时备份
+    backup_on_error: bool = True     # 写入失败时把该批数据暂存到 .wal，下次注册时补写
+    adaptive_interval: bool = True   # 无新数据时逐步拉长定时写入间隔，减少空转唤醒
+    max_write_interval: float = 30.0 # 自适应写入间隔上限（秒）
+    materialize_every: int = 10      # 每写入 N 批重写一次完整 Excel，其余批次只追加到 CSV 增量日志（<= 1 表示每批都重写）
 
 
 class BufferManager:
     """异步缓冲池管理器，用于高效批量写入文件"""
     
+    ARRIVAL_RATE_ALPHA = 0.3  # 到达速率 EWMA 平滑系数
+    
     def __init__(self, config: Optional[BufferConfig] = None):
         """
         初始化缓冲池管理器
@@ -40,11 +154,12 @@ class BufferManager:
         self.config = config or BufferConfig()
         
         # 数据缓冲区
-        self.buffers: Dict[str, deque] = {}
+        self.buffers: Dict[str, ColumnBuffer] = {}
         self.buffer_locks: Dict[str, asyncio.Lock] = {}
         
-        # 写入任务
+        # 后台写入任务，以及通知其立即写入的事件（缓冲区满时由生产者置位）
         self.write_tasks: Dict[str, asyncio.Task] = {}
+        self.flush_events: Dict[str, asyncio.Event] = {}
         self.running = False
         
         # 统计信息
@@ -52,9 +167,25 @@ class BufferManager:
         self.total_items = 0
         self.last_write_time = time.time()
         
+        # 到达速率：上次定时写入以来的新增条数，及其 EWMA（条/秒）
+        self.arrivals: Dict[str, int] = {}
+        self.arrival_rates: Dict[str, float] = {}
+        
         # 文件路径映射
         self.file_paths: Dict[str, str] = {}
         
+        # 各文件已写出的全部数据，注册时读取一次，之后每次写入只在内存中追加，不再重读 Excel
+        self.written_frames: Dict[str, pd.DataFrame] = {}
+        # 已追加到增量日志、尚未合并进 Excel 的批次，以及各文件的写入批次计数
+        self.pending_frames: Dict[str, List[pd.DataFrame]] = {}
+        self.flush_counts: Dict[str, int] = {}
+        
+        # 专用单线程写盘执行器：同一时刻只有一个写操作，写入顺序与提交顺序一致，且不占用默认线程池
+        self._io_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="buffer-io")
+        
+        # ID 日志：写入成功后把指定列的值追加到该文件（每行一个），供断点续跑快速读取
+        self.id_logs: Dict[str, tuple] = {}
+        
 
         
     async def start(self):
@@ -65,15 +196,23 @@ class BufferManager:
         """停止缓冲池管理器，确保所有数据写盘"""
         self.running = False
         
-        # 等待所有写入任务完成
+        # 写入任务可能正处于较长的等待中，直接取消后等待其退出
+        for task in self.write_tasks.values():
+            task.cancel()
         if self.write_tasks:
             await asyncio.gather(*self.write_tasks.values(), return_exceptions=True)
         
-        # 强制刷新所有缓冲区
+        # 强制刷新所有缓冲区，并把增量日志中的数据合并写入 Excel
+        loop = asyncio.get_running_loop()
         for file_id in list(self.buffers.keys()):
             await self._flush_buffer(file_id)
+            async with self.buffer_locks[file_id]:
+                await loop.run_in_executor(self._io_executor, self._materialize, file_id)
+        
+        self._io_executor.shutdown(wait=True)
     
-    def register_file(self, file_id: str, file_path: str, columns: List[str]):
+    def register_file(self, file_id: str, file_path: str, columns: List[str],
+                      id_column: Optional[str] = None, id_log_path: Optional[str] = None):
         """
         注册文件，初始化缓冲区
         
@@ -81,25 +220,50 @@ class BufferManager:
             file_id: 文件标识符
             file_path: 文件路径
             columns: 列名列表
+            id_column: 需要记录到 ID 日志的列
+            id_log_path: 追加写入的 ID 日志路径，与 ``id_column`` 同时指定时生效
         """
+        if _is_parquet(file_path) and not _HAS_PYARROW:
+            raise ImportError(f"写入 Parquet 文件需要安装 pyarrow: {file_path}")
+        
         self.file_paths[file_id] = file_path
-        self.buffers[file_id] = deque(maxlen=self.config.buffer_size)
+        if id_column and id_log_path:
+            self.id_logs[file_id] = (id_column, id_log_path)
+        self.buffers[file_id] = ColumnBuffer(columns)
         self.buffer_locks[file_id] = asyncio.Lock()
         
-        # 初始化文件
-        self._init_file(file_path, columns)
+        # 一次性载入已有数据（主文件缺失或损坏时从 .bak 恢复），再按需重建主文件
+        self.written_frames[file_id] = self._init_file(file_path, columns)
+        self.pending_frames[file_id] = []
+        self.flush_counts[file_id] = 0
+        
+        # 上次运行写入失败暂存的批次与中断时残留的增量日志：合并进 Excel
+        self._replay_wal(file_id)
+        self._replay_journal(file_id)
         
-        # 启动定时写入任务
-        if self.config.strategy in [WriteStrategy.TIMER, WriteStrategy.HYBRID]:
-            self.write_tasks[file_id] = asyncio.create_task(
-                self._periodic_write(file_id)
-            )
+        # 启动后台写入任务
+        self.flush_events[file_id] = asyncio.Event()
+        self.write_tasks[file_id] = asyncio.create_task(
+            self._write_loop(file_id)
+        )
     
-    def _init_file(self, file_path: str, columns: List[str]):
-        """初始化文件，如果不存在则创建"""
-        if not os.path.exists(file_path):
-            df = pd.DataFrame(columns=columns)
-            df.to_excel(file_path, index=False)
+    def _init_file(self, file_path: str, columns: List[str]) -> pd.DataFrame:
+        """
+        载入已有数据并确保主文件可用，返回已写入的数据。
+
+        主文件可读时直接使用；否则用 ``.bak`` 中的数据重建主文件，两者都不可用时才创建只有表头的新文件。
+        必须先读取再创建：若先创建空文件，随后的读取会读到空表，下一次合并时空表还会覆盖掉完好的 ``.bak``
+        """
+        existing, source = self._read_existing(file_path)
+        if source == file_path:
+            return existing
+        
+        if source is None:
+            existing = pd.DataFrame(columns=columns)
+        temp_path = _sibling_path(file_path, ".tmp")
+        _write_frame(existing, temp_path)
+        os.replace(temp_path, file_path)
+        return existing
     
     async def put_data(self, file_id: str, data: Dict[str, Any]) -> bool:
         """
@@ -119,11 +283,11 @@ class BufferManager:
             buffer = self.buffers[file_id]
             buffer.append(data)
             self.total_items += 1
+            self.arrivals[file_id] = self.arrivals.get(file_id, 0) + 1
             
-            # 检查是否需要立即写入
-            if (self.config.strategy == WriteStrategy.SIZE and 
-                len(buffer) >= self.config.buffer_size):
-                await self._flush_buffer(file_id)
+            # 缓冲区已满时通知后台写入任务，生产者不等待写盘
+            if self._is_size_flush_due(buffer):
+                self.flush_events[file_id].set()
             
             return True
     
@@ -143,18 +307,20 @@ class BufferManager:
         
         async with self.buffer_locks[file_id]:
             buffer = self.buffers[file_id]
+            self.total_items += len(data_list)
+            self.arrivals[file_id] = self.arrivals.get(file_id, 0) + len(data_list)
             
-            for data in data_list:
-                buffer.append(data)
-                self.total_items += 1
-            
-            # 检查是否需要立即写入
-            if (self.config.strategy == WriteStrategy.SIZE and 
-                len(buffer) >= self.config.buffer_size):
-                await self._flush_buffer(file_id)
+            buffer.extend(data_list)
+            if self._is_size_flush_due(buffer):
+                self.flush_events[file_id].set()
             
             return True
     
+    def _is_size_flush_due(self, buffer: ColumnBuffer) -> bool:
+        """SIZE / HYBRID 策略下，缓冲区达到 ``buffer_size`` 即需写入"""
+        return (self.config.strategy in (WriteStrategy.SIZE, WriteStrategy.HYBRID) and
+                len(buffer) >= self.config.buffer_size)
+    
     async def _flush_buffer(self, file_id: str) -> bool:
         """
         刷新缓冲区，将数据写入文件
@@ -168,64 +334,250 @@ class BufferManager:
         if file_id not in self.buffers:
             return False
         
+        # 只在取出缓冲数据、提交写盘时持锁：写盘期间生产者可以继续写入缓冲区。
+        # 写盘线程只有一个，在锁内提交即可保证同一文件按取出顺序写入
         async with self.buffer_locks[file_id]:
             buffer = self.buffers[file_id]
-            
             if not buffer:
                 return True
             
-            file_path = self.file_paths[file_id]
-            data_to_write = list(buffer)
+            df_new = buffer.to_frame()
             buffer.clear()
             
+            # 追加日志、合并、写出都是阻塞的磁盘 / CPU 操作，放到写盘线程执行，避免卡住事件循环中的网络请求
+            future = asyncio.get_running_loop().run_in_executor(self._io_executor, self._write_file, file_id, df_new)
+        
+        try:
+            written = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # 线程无法中断：等它写完再退出，避免 stop() 时与最终写入交错
+            await future
+            raise
+        if written:
+            self.total_writes += 1
+            self.last_write_time = time.time()
+        return written
+    
+    def _write_file(self, file_id: str, df_new: pd.DataFrame) -> bool:
+        """
+        将新数据写入文件（在工作线程中执行），失败时按配置备份新数据。
+
+        每批只顺序追加到 CSV 增量日志，开销与批大小成正比；每 ``materialize_every`` 批
+        （以及 ``stop()`` 时）才把累计数据整表写入 Excel
+        """
+        file_path = self.file_paths[file_id]
+        
+        try:
+            self._append_journal(file_id, df_new)
+        except Exception:
+            # 暂存失败批次，不回灌缓冲区，避免写盘持续失败时数据越积越多
+            if self.config.backup_on_error:
+                try:
+                    self._spill_to_wal(file_path, df_new)
+                except Exception:
+                    pass
+            
+            return False
+        
+        self.pending_frames[file_id].append(df_new)
+        self._append_id_log(file_id, df_new)
+        
+        self.flush_counts[file_id] += 1
+        every = self.config.materialize_every
+        if every <= 1 or self.flush_counts[file_id] % every == 0:
+            self._materialize(file_id)
+        
+        return True
+    
+    def _append_journal(self, file_id: str, df_new: pd.DataFrame):
+        """追加一批数据到增量日志，首次写入时带表头"""
+        journal_path = _journal_path(self.file_paths[file_id])
+        write_header = not os.path.exists(journal_path)
+        df_new.to_csv(journal_path, mode="a", header=write_header, index=False, encoding="utf-8")
+    
+    def _materialize(self, file_id: str) -> bool:
+        """
+        把尚未合并的批次整表写入 Excel，成功后清空增量日志。
+
+        先写临时文件再原子替换，上一版保留为 ``.bak``，中途崩溃不会留下半截文件；
+        写入失败时数据仍在增量日志中，下次合并时重试
+        """
+        pending = self.pending_frames[file_id]
+        if not pending:
+            return True
+        
+        file_path = self.file_paths[file_id]
+        try:
+            # 与内存中的已写数据合并，无需重新解析 Excel
+            df_combined = pd.concat([self.written_frames[file_id], *pending], ignore_index=True)
+            
+            # 写入临时文件后替换
+            temp_path = _sibling_path(file_path, ".tmp")
+            _write_frame(df_combined, temp_path)
+            if os.path.exists(file_path):
+                self._backup_file(file_path)
+            # 只做一次替换：任何时刻主文件都存在，中途崩溃时要么是旧版要么是新版
+            os.replace(temp_path, file_path)
+        except Exception:
+            return False
+        
+        self.written_frames[file_id] = df_combined
+        pending.clear()
+        self._touch_id_log(file_id)
+        try:
+            os.remove(_journal_path(file_path))
+        except OSError:
+            pass
+        return True
+    
+    @staticmethod
+    def _spill_to_wal(file_path: str, df_new: pd.DataFrame):
+        """把写入失败的批次逐行追加到 .wal（orjson 序列化，缺失值记为 null）"""
+        rows = df_new.astype(object).where(df_new.notna(), None).to_dict("records")
+        with open(_wal_path(file_path), "ab") as f:
+            f.write(b"".join(orjson.dumps(row, default=str) + b"\n" for row in rows))
+    
+    def _replay_wal(self, file_id: str):
+        """把 .wal 中暂存的批次转入增量日志并补记 ID 日志，之后随增量日志一起合并"""
+        wal_path = _wal_path(self.file_paths[file_id])
+        if not os.path.exists(wal_path):
+            return
+        with open(wal_path, "rb") as f:
+            rows = [orjson.loads(line) for line in f if line.strip()]
+        if rows:
+            df_wal = pd.DataFrame(rows, columns=self.buffers[file_id].columns)
+            self._append_journal(file_id, df_wal)
+            self._append_id_log(file_id, df_wal)
+        os.remove(wal_path)
+    
+    def _replay_journal(self, file_id: str):
+        """读取残留的增量日志并合并写入 Excel；无法解析的日志改名保留，不再追加"""
+        journal_path = _journal_path(self.file_paths[file_id])
+        if not os.path.exists(journal_path):
+            return
+        try:
+            df_journal = pd.read_csv(journal_path, encoding="utf-8")
+        except Exception:
+            os.replace(journal_path, _sibling_path(journal_path, f".backup_{int(time.time())}"))
+            return
+        if df_journal.empty:
+            os.remove(journal_path)
+            return
+        self.pending_frames[file_id].append(df_journal)
+        self._materialize(file_id)
+    
+    @staticmethod
+    def _backup_file(file_path: str):
+        """
+        把当前主文件保存为 ``.bak``（主文件保持不动）：优先硬链接，不支持时复制；
+        先生成临时名再替换，已有的 ``.bak`` 不会处于半截状态
+        """
+        bak_path = _sibling_path(file_path, ".bak")
+        bak_temp = _sibling_path(file_path, ".bak.tmp")
+        if os.path.exists(bak_temp):
+            os.remove(bak_temp)
+        try:
+            os.link(file_path, bak_temp)
+        except OSError:
+            shutil.copy2(file_path, bak_temp)
+        os.replace(bak_temp, bak_path)
+    
+    @staticmethod
+    def _read_existing(file_path: str):
+        """
+        读取已有数据；文件缺失或损坏时回退到上一版 ``.bak``。
+
+        Returns:
+            (数据, 读取的文件路径)，都不可用时为 (空表, ``None``)
+        """
+        for path in (file_path, _sibling_path(file_path, ".bak")):
+            if os.path.exists(path):
+                try:
+                    return _read_frame(path), path
+                except Exception:
+                    continue
+        return pd.DataFrame(), None
+    
+    def _append_id_log(self, file_id: str, df_new: pd.DataFrame):
+        """将本次写入的 ID 追加到 ID 日志（在 Excel 写入成功之后调用）"""
+        if file_id not in self.id_logs:
+            return
+        id_column, id_log_path = self.id_logs[file_id]
+        if id_column not in df_new.columns:
+            return
+        ids = df_new[id_column].dropna().astype(str)
+        if ids.empty:
+            return
+        with open(id_log_path, "a", encoding="utf-8") as f:
+            f.write("\n".join(ids) + "\n")
+    
+    def _touch_id_log(self, file_id: str):
+        """
+        整表写出后更新 ID 日志的修改时间：ID 日志在写出之前就已追加，不更新的话会比输出文件旧，
+        ``DataProcessor.get_processed_ids`` 会判定日志过期而重新解析整个输出文件
+        """
+        if file_id not in self.id_logs:
+            return
+        _, id_log_path = self.id_logs[file_id]
+        try:
+            if os.path.exists(id_log_path):
+                os.utime(id_log_path)
+        except OSError:
+            pass
+    
+    async def _write_loop(self, file_id: str):
+        """
+        后台写入任务：缓冲区满的通知到达时立即写入；TIMER / HYBRID 策略下等待超时即定时写入，
+        并按数据到达情况自适应调整间隔
+        """
+        event = self.flush_events[file_id]
+        timed = self.config.strategy in (WriteStrategy.TIMER, WriteStrategy.HYBRID)
+        interval = self.config.write_interval
+        while self.running:
             try:
-                # 读取现有数据
-                if os.path.exists(file_path):
+                if timed:
                     try:
-                        df_existing = pd.read_excel(file_path)
-                    except Exception:
-                        # 文件损坏，创建新的
-                        df_existing = pd.DataFrame()
+                        await asyncio.wait_for(event.wait(), interval)
+                        size_due = True
+                    except asyncio.TimeoutError:
+                        size_due = False
                 else:
-                    df_existing = pd.DataFrame()
-                
-                # 创建新数据DataFrame
-                df_new = pd.DataFrame(data_to_write)
+                    await event.wait()
+                    size_due = True
+                event.clear()
+                if not self.running:
+                    break
                 
-                # 合并数据
-                df_combined = pd.concat([df_existing, df_new], ignore_index=True)
-                
-                # 写入文件
-                df_combined.to_excel(file_path, index=False)
-                
-                self.total_writes += 1
-                self.last_write_time = time.time()
-                
-                return True
-                
-            except Exception as e:
-                # 错误备份
-                if self.config.backup_on_error:
-                    backup_path = f"{file_path}.backup_{int(time.time())}"
-                    try:
-                        pd.DataFrame(data_to_write).to_excel(backup_path, index=False)
-                    except Exception:
-                        pass
-                
-                return False
-    
-    async def _periodic_write(self, file_id: str):
-        """定时写入任务"""
-        while self.running:
-            try:
-                await asyncio.sleep(self.config.write_interval)
-                if self.running:
+                if size_due:
+                    await self._flush_buffer(file_id)
+                else:
+                    arrivals = self._update_arrival_rate(file_id, interval)
                     await self._flush_buffer(file_id)
+                    interval = self._next_write_interval(interval, arrivals)
             except asyncio.CancelledError:
                 break
             except Exception:
                 pass
     
+    def _update_arrival_rate(self, file_id: str, elapsed: float) -> int:
+        """结算本周期新增条数，更新到达速率 EWMA，返回本周期新增条数"""
+        arrivals = self.arrivals.get(file_id, 0)
+        self.arrivals[file_id] = 0
+        
+        alpha = self.ARRIVAL_RATE_ALPHA
+        rate = arrivals / elapsed if elapsed > 0 else 0.0
+        self.arrival_rates[file_id] = alpha * rate + (1 - alpha) * self.arrival_rates.get(file_id, rate)
+        return arrivals
+    
+    def _next_write_interval(self, interval: float, arrivals: int) -> float:
+        """
+        计算下一次定时写入的间隔：本周期有新数据时恢复为 ``write_interval``；
+        空闲时加倍，直至 ``max_write_interval``
+        """
+        if not self.config.adaptive_interval or arrivals:
+            return self.config.write_interval
+        return min(interval * 2, max(self.config.max_write_interval, self.config.write_interval))
+    
     async def force_flush(self, file_id: Optional[str] = None):
         """
         强制刷新缓冲区
@@ -251,7 +603,8 @@ class BufferManager:
         for file_id, buffer in self.buffers.items():
             status["buffers"][file_id] = {
                 "size": len(buffer),
-                "max_size": buffer.maxlen,
+                "max_size": self.config.buffer_size,
+                "arrival_rate": self.arrival_rates.get(file_id, 0.0),
                 "file_path": self.file_paths.get(file_id, "unknown")
             }
         
@@ -266,6 +619,5 @@ class BufferManager:
     def is_buffer_full(self, file_id: str) -> bool:
         """检查缓冲区是否已满"""
         if file_id in self.buffers:
-            buffer = self.buffers[file_id]
-            return len(buffer) >= buffer.maxlen
+            return len(self.buffers[file_id]) >= self.config.buffer_size
         return False 
\ No newline at end of file
@@ -0,0 +1,154 @@
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass(slots=True)
+class CongestionStats:
+    """拥塞控制统计（当前调整周期内的成功 / 失败数及拥塞窗口），每个请求都会读写，使用 slots 省去实例字典"""
+    success_count: int = 0
+    failure_count: int = 0
+    total_requests: int = 0
+    last_adjustment_ns: int = field(default_factory=time.monotonic_ns)  # 上次调整的单调时钟时间（纳秒）
+    current_cwnd: int = 1
+    max_cwnd: int = 10
+    min_cwnd: int = 1
+    ssthresh: int = 5  # 慢启动阈值：窗口低于该值时每个周期翻倍，达到后转为加性增大
+    consecutive_failures: int = 0  # 连续失败次数，成功一次即清零
+    avg_rtt: float = 0.0  # 成功请求耗时的 EWMA（秒）
+    # 最近几个调整周期的完成速率（请求/秒），用于估计可用吞吐
+    throughput_samples: deque = field(default_factory=lambda: deque(maxlen=4))
+
+
+class CongestionController:
+    """
+    AIMD 拥塞窗口控制器（含慢启动）
+
+    按请求结果调整允许的在途请求数（拥塞窗口），窗口范围为 ``[min_cwnd, max_cwnd]``：
+
+    - 慢启动：窗口从 ``min_cwnd`` 起步，低于 ``ssthresh`` 时每个无失败的调整周期翻倍；
+    - 拥塞避免：达到 ``ssthresh`` 后，每个成功请求使窗口增加 ``1 / cwnd``（相当于每轮往返加一）；
+    - 限流（503 / 429）：``ssthresh`` 设为当前窗口的一半，窗口乘以 7/8；
+    - 拥塞避免与周期结算的乘性减小之后，窗口不低于最小带宽估计
+      （近几个周期最大完成速率的一半）× 平均耗时；
+      连续 ``FAST_BACKOFF_FAILURES`` 次失败时不等调整周期结束，立即减小。
+
+    窗口以实数累计，对外取四舍五入后的整数，避免小窗口下的截断误差。
+
+    各方法均为同步方法，只在事件循环线程中调用且内部没有 await，不会被其他协程打断，无需加锁。
+    """
+
+    FAST_BACKOFF_FAILURES = 3  # 连续失败达到该次数时立即减小窗口
+    RTT_ALPHA = 0.125          # 平均耗时 EWMA 平滑系数
+
+    def __init__(self, max_cwnd: int, min_cwnd: int = 1, adjustment_interval: float = 1.0):
+        """
+        Args:
+            max_cwnd: 窗口上限（即配置的最大并发数）
+            min_cwnd: 窗口下限，也是慢启动的初始窗口
+            adjustment_interval: 调整周期（秒），周期内的结果合并为一次调整
+        """
+        self.adjustment_interval = adjustment_interval
+        # 换算为整数纳秒，热路径上只做整数比较；单调时钟不受系统时间回拨影响
+        self.adjustment_interval_ns = int(adjustment_interval * 1e9)
+        max_cwnd = max(1, max_cwnd)
+        min_cwnd = max(1, min(min_cwnd, max_cwnd))
+        self.stats = self._initial_stats(max_cwnd, min_cwnd)
+        self._cwnd_real = float(min_cwnd)
+
+    @staticmethod
+    def _initial_stats(max_cwnd: int, min_cwnd: int) -> CongestionStats:
+        return CongestionStats(current_cwnd=min_cwnd, max_cwnd=max_cwnd, min_cwnd=min_cwnd,
+                               ssthresh=max(min_cwnd, max_cwnd // 2))
+
+    def record_success(self, rtt: Optional[float] = None) -> int:
+        """记录一次成功请求（``rtt`` 为该请求耗时，秒），返回调整后的窗口"""
+        stats = self.stats
+        if rtt is not None and rtt > 0:
+            stats.avg_rtt = rtt if not stats.avg_rtt else stats.avg_rtt + self.RTT_ALPHA * (rtt - stats.avg_rtt)
+        stats.success_count += 1
+        stats.total_requests += 1
+        stats.consecutive_failures = 0
+        self._adjust_window()
+        return stats.current_cwnd
+
+    def record_failure(self) -> int:
+        """记录一次限流失败，返回调整后的窗口"""
+        stats = self.stats
+        stats.failure_count += 1
+        stats.total_requests += 1
+        stats.consecutive_failures += 1
+        if stats.consecutive_failures >= self.FAST_BACKOFF_FAILURES:
+            # 服务端开始成片限流：立即减小窗口并开始新的调整周期，本轮失败不再重复计入
+            stats.consecutive_failures = 0
+            self._decrease_window()
+            self._start_interval(time.monotonic_ns())
+        else:
+            self._adjust_window()
+        return stats.current_cwnd
+
+    def _adjust_window(self):
+        """调整周期到期时按本周期结果调整窗口：有失败则乘性减小，否则慢启动翻倍或加性增大"""
+        now = time.monotonic_ns()
+        elapsed_ns = now - self.stats.last_adjustment_ns
+        if elapsed_ns < self.adjustment_interval_ns:
+            return
+
+        stats = self.stats
+        stats.throughput_samples.append((stats.success_count + stats.failure_count) * 1e9 / elapsed_ns)
+        cwnd = self._cwnd_real
+        if stats.failure_count:
+            self._decrease_window()
+            # 乘性减小不低于最小带宽估计对应的窗口，避免偶发失败把窗口压到撑不起已观测吞吐
+            self._set_window(max(self._cwnd_real, self._bandwidth_floor()))
+        elif stats.success_count and cwnd < stats.ssthresh:
+            # 慢启动：每个周期翻倍，O(log max_cwnd) 个周期即可达到阈值
+            self._set_window(min(stats.max_cwnd, cwnd * 2))
+        elif stats.success_count:
+            # 加性增大：本周期每个成功请求加 1/w，批量结算；
+            # 窗口撑不起最小带宽估计时直接放大到估计值对应的窗口（带宽 × 耗时）
+            target = max(cwnd + stats.success_count / cwnd, self._bandwidth_floor())
+            self._set_window(min(stats.max_cwnd, target))
+        self._start_interval(now)
+
+    def _bandwidth_floor(self) -> float:
+        """最小带宽估计（观测到的最大吞吐的一半）× 平均耗时对应的窗口；尚无耗时样本时为 0"""
+        stats = self.stats
+        if not stats.avg_rtt or not stats.throughput_samples:
+            return 0.0
+        return min(stats.max_cwnd, max(stats.throughput_samples) / 2 * stats.avg_rtt)
+
+    def _decrease_window(self):
+        """阈值减半，之后的增长走拥塞避免；乘性减小：w - w/8（减小系数 7/8，比减半温和）"""
+        stats = self.stats
+        cwnd = self._cwnd_real
+        stats.ssthresh = max(stats.min_cwnd, int(cwnd) >> 1)
+        self._set_window(max(stats.min_cwnd, cwnd - cwnd / 8))
+
+    def _start_interval(self, now_ns: int):
+        """清零周期计数，开始新的调整周期"""
+        stats = self.stats
+        stats.success_count = 0
+        stats.failure_count = 0
+        stats.last_adjustment_ns = now_ns
+
+    def _set_window(self, cwnd: float):
+        self._cwnd_real = cwnd
+        self.stats.current_cwnd = int(round(cwnd))
+
+    def set_max_window(self, max_cwnd: int):
+        """调整窗口上限，窗口直接放开到新上限"""
+        stats = self.stats
+        stats.max_cwnd = max(1, max_cwnd)
+        stats.min_cwnd = min(stats.min_cwnd, stats.max_cwnd)
+        self._set_window(float(stats.max_cwnd))
+
+    def get_current_window(self) -> int:
+        """获取当前拥塞窗口"""
+        return self.stats.current_cwnd
+
+    def reset(self):
+        """恢复到初始状态（重新慢启动）"""
+        self.stats = self._initial_stats(self.stats.max_cwnd, self.stats.min_cwnd)
+        self._cwnd_real = float(self.stats.min_cwnd)
@@ -0,0 +1,31 @@
+import asyncio
+
+
+def install_fast_event_loop() -> bool:
+    """
+    优先使用 uvloop（POSIX）/ winloop（Windows）事件循环，未安装时沿用标准库实现
+
+    必须在创建事件循环（``asyncio.run``）之前调用才会生效。
+
+    Returns:
+        bool: 是否启用了 uvloop / winloop
+    """
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        return True
+    except ImportError:
+        pass
+    
+    try:
+        import winloop
+        asyncio.set_event_loop_policy(winloop.EventLoopPolicy())
+        return True
+    except ImportError:
+        return False
+
+
+def run_async(coro):
+    """在尽可能快的事件循环上运行协程"""
+    install_fast_event_loop()
+    return asyncio.run(coro)
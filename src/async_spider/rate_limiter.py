@@ -0,0 +1,121 @@
+import asyncio
+import time
+from collections import deque
+from typing import Optional
+
+
+class AsyncTokenBucket:
+    """
+    异步令牌桶限流器
+
+    按 ``rate`` 个/秒补充令牌，最多积攒 ``burst`` 个；并发请求在令牌充足时
+    直接放行，不足时排队等待，整体速率不超过 ``rate``。
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Args:
+            rate: 每秒补充的令牌数，<= 0 表示不限速
+            burst: 令牌桶容量（允许的最大突发请求数）
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        """按距上次更新的时间补充令牌"""
+        now = time.monotonic()
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def configure(self, rate: float, burst: Optional[int] = None):
+        """调整速率 / 容量，已积攒的令牌按新容量截断"""
+        if rate == self.rate and (burst is None or burst == self.burst):
+            return
+        self._refill()
+        self.rate = rate
+        if burst is not None:
+            self.burst = max(1, burst)
+            self._tokens = min(self._tokens, self.burst)
+
+    async def acquire(self):
+        """获取一个令牌，不足时等待补充"""
+        if self.rate <= 0:
+            return
+
+        # 持锁等待，保证排队的请求按到达顺序依次放行
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class AsyncConcurrencyLimiter:
+    """
+    上限可动态调整的并发限制器
+
+    用法同 ``asyncio.Semaphore``（``async with limiter:``），但可以在运行中通过
+    ``set_limit`` 调整上限：调高时立即放行排队的请求，调低时已在途的请求不受影响，
+    新请求等到在途数降到新上限以下才放行。
+    """
+
+    def __init__(self, limit: int):
+        self._limit = max(1, int(limit))
+        self._in_flight = 0
+        self._waiters = deque()
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def set_limit(self, limit: int):
+        """调整并发上限"""
+        self._limit = max(1, int(limit))
+        self._wake_waiters()
+
+    def _wake_waiters(self):
+        """按排队顺序放行，直到达到上限"""
+        while self._waiters and self._in_flight < self._limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._in_flight += 1
+                waiter.set_result(None)
+
+    async def acquire(self):
+        if self._in_flight < self._limit and not self._waiters:
+            self._in_flight += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        # 队首可能是已取消的等待者，此时当前请求可以直接放行
+        self._wake_waiters()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # 已分到名额但调用方被取消：归还名额
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+
+    def release(self):
+        self._in_flight -= 1
+        self._wake_waiters()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
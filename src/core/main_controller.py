@@ -1,34 +1,142 @@
 import argparse
+import multiprocessing
 import os
-import asyncio
-from typing import Optional, List
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Optional, List, Tuple
 
-from ..api.api_client import YMGalAPIClient
+import pandas as pd
+
+from ..api.api_client import YMGalAPIClient, get_api_client
 from ..data.data_processor import DataProcessor
 from ..matching.matching_engine import MatchingEngine
-from ..async_spider import AsyncMatchingEngine
+from ..utils.logger import flush_logs
+from ..async_spider import AsyncMatchingEngine, run_async
+
+
+# 搜索结果 / 会社详情的持久化缓存（SQLite）
+_QUERY_CACHE_PATH = "save/.query_cache.sqlite"
+
+# 交互模式的输出文件（匹配结果, 未匹配, 会社信息），按文件名后缀区分同步 / 异步模式
+_OUTPUT_PATHS = {
+    suffix: (f"save/products_matched{suffix}.xlsx",
+             f"save/products_unmatched{suffix}.xlsx",
+             f"save/organizations_info{suffix}.xlsx")
+    for suffix in ("", "_async")
+}
+
+
+@lru_cache(maxsize=8)
+def _scan_excel_files(data_dir: str, dir_mtime_ns: int) -> Tuple[str, ...]:
+    """扫描目录中的 Excel 文件；以目录修改时间为缓存键，目录内容未变时直接复用上次结果"""
+    with os.scandir(data_dir) as entries:
+        return tuple(entry.name for entry in entries
+                     if entry.name.endswith('.xlsx') and entry.is_file())
+
+
+def _timed_sync_leg(input_file: str, df_bgm: pd.DataFrame) -> Tuple[float, float]:
+    """性能测试子进程：运行同步版本，返回 (开始, 结束) 单调时钟时间"""
+    # 不使用持久化缓存，计时反映真实的接口请求，而不是上次运行留下的缓存命中
+    controller = MainController(api_client=YMGalAPIClient(cache_path=None))
+    start = time.monotonic()
+    try:
+        controller.run_basic_matching(
+            input_file=input_file,
+            output_file="save/sync_test.xlsx",
+            unmatched_file="save/sync_unmatched.xlsx",
+            org_output_file="save/sync_org.xlsx",
+            df_bgm=df_bgm
+        )
+        return start, time.monotonic()
+    finally:
+        # 进程池子进程退出时不执行 atexit，日志需在返回前写出
+        flush_logs()
+
+
+def _timed_async_leg(input_file: str, df_bgm: pd.DataFrame) -> Tuple[float, float]:
+    """性能测试子进程：运行异步版本，返回 (开始, 结束) 单调时钟时间"""
+    controller = MainController(api_client=YMGalAPIClient(cache_path=None))
+    start = time.monotonic()
+    try:
+        run_async(controller.run_async_basic_matching(
+            input_file=input_file,
+            output_file="save/async_test.xlsx",
+            unmatched_file="save/async_unmatched.xlsx",
+            org_output_file="save/async_org.xlsx",
+            df_bgm=df_bgm,
+            cache_path=None
+        ))
+        return start, time.monotonic()
+    finally:
+        flush_logs()
 
 
 class MainController:
     """主控制器，协调各个组件的工作"""
     
-    def __init__(self):
-        self.api_client = YMGalAPIClient()
+    _save_dir_ensured = False  # save 目录已确认存在，后续不再重复检查
+    
+    # 交互菜单编号 -> 匹配模式
+    _MODE_MAP = {
+        "1": "basic",
+        "2": "alias",
+        "3": "async_basic",
+        "4": "async_alias",
+        "5": "performance_test",
+    }
+    
+    # 非交互模式：模式 -> (处理方法名, 参数默认值, 是否为协程)
+    _RUN_MODES = {
+        "basic": ("run_basic_matching", {
+            "input_file": "bgm_archive_20250525 (1).xlsx",
+            "output_file": "ymgames_matched.xlsx",
+            "unmatched_file": "ymgames_unmatched.xlsx",
+            "org_output_file": "organizations_info.xlsx",
+        }, False),
+        "alias": ("run_alias_matching", {
+            "input_file": "主表_updated_processed_aliases_20250621_124012.xlsx",
+            "output_file": "ymgames_matched.xlsx",
+            "unmatched_file": "ymgames_unmatched.xlsx",
+            "org_output_file": "organizations_info.xlsx",
+        }, False),
+        "async_basic": ("run_async_basic_matching", {
+            "input_file": "bgm_archive_20250525 (1).xlsx",
+            "output_file": "ymgames_matched_async.xlsx",
+            "unmatched_file": "ymgames_unmatched_async.xlsx",
+            "org_output_file": "organizations_info_async.xlsx",
+        }, True),
+        "async_alias": ("run_async_alias_matching", {
+            "input_file": "主表_updated_processed_aliases_20250621_124012.xlsx",
+            "output_file": "ymgames_matched_aliases_async.xlsx",
+            "unmatched_file": "ymgames_unmatched_aliases_async.xlsx",
+            "org_output_file": "organizations_info_aliases_async.xlsx",
+        }, True),
+        "secondary": ("run_secondary_matching", {
+            "ym_file": "ymgames_matched.xlsx",
+            "bangumi_file": "processed_games_test5.xlsx",
+            "output_file": "ym_bangumi_matched.csv",
+        }, False),
+    }
+    
+    def __init__(self, api_client: Optional[YMGalAPIClient] = None):
+        """
+        Args:
+            api_client: 使用的接口客户端；为 ``None`` 时使用进程内共享的客户端（带持久化缓存）
+        """
+        self.api_client = api_client or get_api_client(cache_path=_QUERY_CACHE_PATH)
         self.data_processor = DataProcessor()
         self.matching_engine = MatchingEngine(self.api_client, self.data_processor)
     
     def list_data_files(self) -> List[str]:
         """列出data文件夹中的Excel文件"""
         data_dir = "data"
-        if not os.path.exists(data_dir):
+        try:
+            dir_mtime_ns = os.stat(data_dir).st_mtime_ns
+        except OSError:
             return []
         
-        excel_files = []
-        for file in os.listdir(data_dir):
-            if file.endswith('.xlsx'):
-                excel_files.append(file)
-        
-        return excel_files
+        return list(_scan_excel_files(data_dir, dir_mtime_ns))
     
     def select_input_file(self) -> str:
         """让用户选择输入文件"""
@@ -70,20 +178,10 @@ class MainController:
         
         while True:
             try:
-                choice = input("请输入选择 (1-5): ").strip()
-                
-                if choice == "1":
-                    return "basic"
-                elif choice == "2":
-                    return "alias"
-                elif choice == "3":
-                    return "async_basic"
-                elif choice == "4":
-                    return "async_alias"
-                elif choice == "5":
-                    return "performance_test"
-                else:
-                    print("无效选择，请输入1-5")
+                mode = self._MODE_MAP.get(input("请输入选择 (1-5): ").strip())
+                if mode:
+                    return mode
+                print("无效选择，请输入1-5")
             except KeyboardInterrupt:
                 print("\n用户取消")
                 return ""
@@ -106,22 +204,31 @@ class MainController:
                 print("\n用户取消")
                 return 50
     
+    @classmethod
+    def _ensure_save_dir(cls) -> None:
+        """创建 save 目录（每个进程只检查一次）"""
+        if not cls._save_dir_ensured:
+            os.makedirs("save", exist_ok=True)
+            cls._save_dir_ensured = True
+    
     def run_basic_matching(self, input_file: str, output_file: str, 
-                          unmatched_file: str, org_output_file: str) -> None:
+                          unmatched_file: str, org_output_file: str,
+                          df_bgm: Optional[pd.DataFrame] = None) -> None:
         """运行基础匹配流程（第一个源代码的功能）"""
         print("开始基础匹配流程...")
-        self.matching_engine.match_bgm_games_and_save(
+        self.matching_engine.match_bgm_products_and_save(
             input_file=input_file,
             output_file=output_file,
             unmatched_file=unmatched_file,
-            org_output_file=org_output_file
+            org_output_file=org_output_file,
+            df_bgm=df_bgm
         )
     
     def run_alias_matching(self, input_file: str, output_file: str,
                           unmatched_file: str, org_output_file: str) -> None:
         """运行别名匹配流程（第二个源代码的功能）"""
         print("开始别名匹配流程...")
-        self.matching_engine.match_bgm_games_with_aliases_and_save(
+        self.matching_engine.match_bgm_products_with_aliases_and_save(
             input_file=input_file,
             output_file=output_file,
             unmatched_file=unmatched_file,
@@ -129,16 +236,19 @@ class MainController:
         )
     
     async def run_async_basic_matching(self, input_file: str, output_file: str,
-                                     unmatched_file: str, org_output_file: str, batch_size: int = 50) -> None:
-        """运行异步基础匹配流程"""
+                                     unmatched_file: str, org_output_file: str, batch_size: int = 50,
+                                     df_bgm: Optional[pd.DataFrame] = None,
+                                     cache_path: Optional[str] = _QUERY_CACHE_PATH) -> None:
+        """运行异步基础匹配流程（``cache_path`` 为 ``None`` 时不使用持久化缓存）"""
         print("开始异步基础匹配流程...")
         
         # 创建异步匹配引擎（高性能配置）
         engine = AsyncMatchingEngine(
             max_concurrent=8,       # 提高并发数
-            buffer_size=500,        # 增大缓冲区
-            write_interval=1.0,     # 减少写入间隔
-            batch_size=batch_size   # 批次大小
+            buffer_size=1000,       # 增大缓冲区，满即写入
+            write_interval=10.0,    # 每次写入摊薄更多行
+            batch_size=batch_size,  # 批次大小
+            cache_path=cache_path
         )
         
         try:
@@ -150,7 +260,8 @@ class MainController:
                 input_file=input_file,
                 output_file=output_file,
                 unmatched_file=unmatched_file,
-                org_output_file=org_output_file
+                org_output_file=org_output_file,
+                df_bgm=df_bgm
             )
             
         except Exception as e:
@@ -167,9 +278,10 @@ class MainController:
         # 创建异步匹配引擎（高性能配置）
         engine = AsyncMatchingEngine(
             max_concurrent=8,       # 提高并发数
-            buffer_size=600,        # 增大缓冲区
-            write_interval=1.0,     # 减少写入间隔
-            batch_size=batch_size   # 批次大小
+            buffer_size=1000,       # 增大缓冲区，满即写入
+            write_interval=10.0,    # 每次写入摊薄更多行
+            batch_size=batch_size,  # 批次大小
+            cache_path=_QUERY_CACHE_PATH
         )
         
         try:
@@ -194,9 +306,9 @@ class MainController:
                               output_file: str) -> None:
         """运行二次匹配流程"""
         print("开始二次匹配流程...")
-        self.matching_engine.match_ym_with_bangumi(
-            ym_file=ym_file,
-            bangumi_file=bangumi_file,
+        self.matching_engine.match_target_with_source(
+            target_file=ym_file,
+            source_file=bangumi_file,
             output_file=output_file
         )
     
@@ -214,19 +326,11 @@ class MainController:
         if not input_file:
             return
         
-        # 设置输出文件
-        if mode.startswith("async_"):
-            # 异步模式使用不同的输出文件名
-            suffix = "_async"
-        else:
-            # 同步模式使用原有文件名
-            suffix = ""
-        output_file = f"save/products_matched{suffix}.xlsx"
-        unmatched_file = f"save/products_unmatched{suffix}.xlsx"
-        org_output_file = f"save/organizations_info{suffix}.xlsx"
+        # 设置输出文件：异步模式使用不同的输出文件名，同步模式使用原有文件名
+        output_file, unmatched_file, org_output_file = _OUTPUT_PATHS["_async" if mode.startswith("async_") else ""]
         
         # 确保输出目录存在
-        os.makedirs("save", exist_ok=True)
+        self._ensure_save_dir()
         
         # 运行选择的模式
         if mode == "basic":
@@ -245,7 +349,7 @@ class MainController:
             )
         elif mode == "async_basic":
             batch_size = self.select_batch_size()
-            asyncio.run(self.run_async_basic_matching(
+            run_async(self.run_async_basic_matching(
                 input_file=input_file,
                 output_file=output_file,
                 unmatched_file=unmatched_file,
@@ -254,7 +358,7 @@ class MainController:
             ))
         elif mode == "async_alias":
             batch_size = self.select_batch_size()
-            asyncio.run(self.run_async_alias_matching(
+            run_async(self.run_async_alias_matching(
                 input_file=input_file,
                 output_file=output_file,
                 unmatched_file=unmatched_file,
@@ -265,87 +369,53 @@ class MainController:
             self.run_performance_test(input_file)
     
     def run(self, mode: str = "basic", **kwargs) -> None:
-        """运行主程序"""
-        if mode == "basic":
-            self.run_basic_matching(
-                input_file=kwargs.get("input_file", "bgm_archive_20250525 (1).xlsx"),
-                output_file=kwargs.get("output_file", "ymgames_matched.xlsx"),
-                unmatched_file=kwargs.get("unmatched_file", "ymgames_unmatched.xlsx"),
-                org_output_file=kwargs.get("org_output_file", "organizations_info.xlsx")
-            )
-        elif mode == "alias":
-            self.run_alias_matching(
-                input_file=kwargs.get("input_file", "主表_updated_processed_aliases_20250621_124012.xlsx"),
-                output_file=kwargs.get("output_file", "ymgames_matched.xlsx"),
-                unmatched_file=kwargs.get("unmatched_file", "ymgames_unmatched.xlsx"),
-                org_output_file=kwargs.get("org_output_file", "organizations_info.xlsx")
-            )
-        elif mode == "async_basic":
-            asyncio.run(self.run_async_basic_matching(
-                input_file=kwargs.get("input_file", "bgm_archive_20250525 (1).xlsx"),
-                output_file=kwargs.get("output_file", "ymgames_matched_async.xlsx"),
-                unmatched_file=kwargs.get("unmatched_file", "ymgames_unmatched_async.xlsx"),
-                org_output_file=kwargs.get("org_output_file", "organizations_info_async.xlsx")
-            ))
-        elif mode == "async_alias":
-            asyncio.run(self.run_async_alias_matching(
-                input_file=kwargs.get("input_file", "主表_updated_processed_aliases_20250621_124012.xlsx"),
-                output_file=kwargs.get("output_file", "ymgames_matched_aliases_async.xlsx"),
-                unmatched_file=kwargs.get("unmatched_file", "ymgames_unmatched_aliases_async.xlsx"),
-                org_output_file=kwargs.get("org_output_file", "organizations_info_aliases_async.xlsx")
-            ))
-        elif mode == "secondary":
-            self.run_secondary_matching(
-                ym_file=kwargs.get("ym_file", "ymgames_matched.xlsx"),
-                bangumi_file=kwargs.get("bangumi_file", "processed_games_test5.xlsx"),
-                output_file=kwargs.get("output_file", "ym_bangumi_matched.csv")
-            )
-        else:
+        """运行主程序（非交互模式），未指定的参数使用该模式的默认值"""
+        spec = self._RUN_MODES.get(mode)
+        if spec is None:
             print(f"未知的模式: {mode}")
+            return
+        
+        method_name, defaults, is_async = spec
+        params = {key: kwargs.get(key, default) for key, default in defaults.items()}
+        result = getattr(self, method_name)(**params)
+        if is_async:
+            run_async(result)
     
     def run_performance_test(self, input_file: str) -> None:
-        """运行性能对比测试"""
-        import time
-        
+        """
+        运行性能对比测试
+
+        同步、异步版本在两个子进程中同时运行，分别写入独立的输出文件，
+        总耗时为两者中较慢的一个。两个版本同时访问接口、共享本机网络与服务端限流额度，
+        测得的是并发运行下的耗时，而不是各自独占时的耗时。
+        """
         print("\n=== 性能对比测试 ===")
         print(f"测试文件: {input_file}")
         
-        # 确保输出目录存在
-        os.makedirs("save", exist_ok=True)
-        
-        # 测试同步版本
-        print("\n1. 测试同步版本...")
-        sync_start = time.time()
-        
-        try:
-            self.run_basic_matching(
-                input_file=input_file,
-                output_file="save/sync_test.xlsx",
-                unmatched_file="save/sync_unmatched.xlsx",
-                org_output_file="save/sync_org.xlsx"
-            )
-            sync_time = time.time() - sync_start
-            print(f"同步版本完成，耗时: {sync_time:.2f}秒")
-        except Exception as e:
-            print(f"同步版本测试失败: {e}")
-            sync_time = float('inf')
+        # 确保输出目录存在（子进程继承当前工作目录）
+        self._ensure_save_dir()
         
-        # 测试异步版本
-        print("\n2. 测试异步版本...")
-        async_start = time.time()
+        # 源表只解析一次，随任务传给两个子进程，计时只反映匹配本身
+        df_bgm = self.data_processor.read_bgm_data(input_file)
         
-        try:
-            asyncio.run(self.run_async_basic_matching(
-                input_file=input_file,
-                output_file="save/async_test.xlsx",
-                unmatched_file="save/async_unmatched.xlsx",
-                org_output_file="save/async_org.xlsx"
-            ))
-            async_time = time.time() - async_start
-            print(f"异步版本完成，耗时: {async_time:.2f}秒")
-        except Exception as e:
-            print(f"异步版本测试失败: {e}")
-            async_time = float('inf')
+        print("\n同时测试同步版本与异步版本...")
+        wall_start = time.monotonic()
+        legs = (("同步", _timed_sync_leg), ("异步", _timed_async_leg))
+        # 用 spawn 启动全新的子进程：fork 会继承日志后台线程（子进程中不存在，输出丢失）
+        # 与共享客户端中已打开的 SQLite 连接（不能跨 fork 使用）
+        with ProcessPoolExecutor(max_workers=len(legs), mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [(label, executor.submit(leg, input_file, df_bgm)) for label, leg in legs]
+            elapsed = []
+            for label, future in futures:
+                try:
+                    start, end = future.result()
+                    elapsed.append(end - start)
+                    print(f"{label}版本完成，耗时: {end - start:.2f}秒")
+                except Exception as e:
+                    print(f"{label}版本测试失败: {e}")
+                    elapsed.append(float('inf'))
+        sync_time, async_time = elapsed
+        print(f"测试总耗时: {time.monotonic() - wall_start:.2f}秒")
         
         # 显示对比结果
         print("\n=== 性能对比结果 ===")
@@ -375,7 +445,7 @@ class MainController:
 def main():
     """主程序入口"""
     parser = argparse.ArgumentParser(description="Bangumi-月幕游戏匹配工具")
-    parser.add_argument("--mode", choices=["basic", "alias", "async_basic", "async_alias", "secondary", "interactive"], 
+    parser.add_argument("--mode", choices=[*MainController._RUN_MODES, "interactive"],
                        default="interactive", help="运行模式")
     
     # 基础匹配参数
@@ -394,40 +464,18 @@ def main():
     
     if args.mode == "interactive":
         controller.run_interactive()
-    elif args.mode == "basic":
-        controller.run_basic_matching(
-            input_file=args.input or "bgm_archive_20250525 (1).xlsx",
-            output_file=args.output or "ymgames_matched.xlsx",
-            unmatched_file=args.unmatched or "ymgames_unmatched.xlsx",
-            org_output_file=args.org_output or "organizations_info.xlsx"
-        )
-    elif args.mode == "alias":
-        controller.run_alias_matching(
-            input_file=args.input or "主表_updated_processed_aliases_20250621_124012.xlsx",
-            output_file=args.output or "ymgames_matched.xlsx",
-            unmatched_file=args.unmatched or "ymgames_unmatched.xlsx",
-            org_output_file=args.org_output or "organizations_info.xlsx"
-        )
-    elif args.mode == "async_basic":
-        asyncio.run(controller.run_async_basic_matching(
-            input_file=args.input or "bgm_archive_20250525 (1).xlsx",
-            output_file=args.output or "ymgames_matched_async.xlsx",
-            unmatched_file=args.unmatched or "ymgames_unmatched_async.xlsx",
-            org_output_file=args.org_output or "organizations_info_async.xlsx"
-        ))
-    elif args.mode == "async_alias":
-        asyncio.run(controller.run_async_alias_matching(
-            input_file=args.input or "主表_updated_processed_aliases_20250621_124012.xlsx",
-            output_file=args.output or "ymgames_matched_aliases_async.xlsx",
-            unmatched_file=args.unmatched or "ymgames_unmatched_aliases_async.xlsx",
-            org_output_file=args.org_output or "organizations_info_aliases_async.xlsx"
-        ))
-    elif args.mode == "secondary":
-        controller.run_secondary_matching(
-            ym_file=args.ym_file or "ymgames_matched.xlsx",
-            bangumi_file=args.bangumi_file or "processed_games_test5.xlsx",
-            output_file=args.output or "ym_bangumi_matched.csv"
-        )
+        return
+    
+    # 命令行参数 -> 处理方法参数，未提供的参数交给 run() 取该模式的默认值
+    params = {
+        "input_file": args.input,
+        "output_file": args.output,
+        "unmatched_file": args.unmatched,
+        "org_output_file": args.org_output,
+        "ym_file": args.ym_file,
+        "bangumi_file": args.bangumi_file,
+    }
+    controller.run(args.mode, **{key: value for key, value in params.items() if value})
 
 
 if __name__ == "__main__":
@@ -1,7 +1,37 @@
+import csv
 import os
+import zipfile
+import orjson
 import pandas as pd
-from openpyxl import load_workbook
-from typing import List, Dict, Any
+from importlib.util import find_spec
+from openpyxl import Workbook, load_workbook
+from collections import namedtuple
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple, Union
+
+
+_HAS_CALAMINE = find_spec("python_calamine") is not None
+
+# 读取 Excel 优先使用 calamine 引擎（Rust 实现的流式解析，比 openpyxl 构建整棵 XML 树快得多、占用内存少），
+# 需要 python-calamine 且 pandas >= 2.2；不满足时回退到 openpyxl
+_EXCEL_READ_ENGINE = (
+    "calamine"
+    if _HAS_CALAMINE and tuple(int(part) for part in pd.__version__.split(".")[:2]) >= (2, 2)
+    else "openpyxl"
+)
+
+
+def _is_csv(file_path: str) -> bool:
+    """输出路径以 .csv 结尾时按 CSV 追加写入：只在文件末尾追加几行，不必像 xlsx 那样每次重新压缩整个文件"""
+    return file_path.lower().endswith(".csv")
+
+
+def _calamine_value(value: Any) -> Any:
+    """calamine 单元格值：空单元格为 ``None``，整数值的浮点数转为 int（与 pandas 读取整数列一致）"""
+    if value == "":
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
 
 
 class DataProcessor:
@@ -19,8 +49,15 @@ class DataProcessor:
         "org_id", "name", "chineseName", "website", "description", "birthday"
     ]
     
+    # 源文件中的 ID / 名称列按字符串读取：ID 不会因为缺失值被读成浮点数（"123.0"），名称使用紧凑的字符串类型
+    SOURCE_DTYPES = {"id": "string", "bgm_id": "string", "日文名": "string", "中文名": "string"}
+    
+    FLUSH_EVERY = 500  # 缓冲写入：每积攒多少行追加写入一次
+    
     def __init__(self):
-        pass
+        # 待写入的匹配结果行，按输出文件分组
+        self._pending_rows: Dict[str, List[Union[Dict[str, Any], ResultRow]]] = {}
+        self._flush_every = self.FLUSH_EVERY
     
     def init_excel(self, output_file: str) -> None:
         """
@@ -29,104 +66,388 @@ class DataProcessor:
         need_create = False
         if not os.path.exists(output_file):
             need_create = True
-        else:
+        elif not _is_csv(output_file):
+            # xlsx 是 zip 包：校验压缩包完整并包含工作表即可，不必用 load_workbook 解析全部 XML
             try:
-                load_workbook(output_file)
-            except Exception:
+                with zipfile.ZipFile(output_file) as archive:
+                    need_create = (archive.testzip() is not None
+                                   or "xl/worksheets/sheet1.xml" not in archive.namelist())
+            except (zipfile.BadZipFile, OSError):
                 need_create = True
 
         if need_create:
-            pd.DataFrame(columns=self.EXCEL_COLUMNS_MATCHED).to_excel(output_file, index=False)
+            self._write_header_only(output_file, self.EXCEL_COLUMNS_MATCHED)
+            # 旧的 ID 日志对应已丢弃的文件，不能再用于断点续跑
+            id_log = self.processed_ids_log(output_file)
+            if os.path.exists(id_log):
+                os.remove(id_log)
             print(f"已初始化输出文件：{output_file}")
 
     def init_org_excel(self, output_file: str) -> None:
         """类似 ``init_excel``，但针对会社信息文件。"""
         if not os.path.exists(output_file):
-            pd.DataFrame(columns=self.EXCEL_COLUMNS_ORG).to_excel(output_file, index=False)
+            self._write_header_only(output_file, self.EXCEL_COLUMNS_ORG)
             print(f"已初始化会社信息文件：{output_file}")
 
-    def append_to_excel(self, row_data: List[Dict[str, Any]], output_file: str) -> None:
+    @staticmethod
+    def _write_header_only(output_file: str, columns: List[str]) -> None:
+        """创建只有表头的输出文件（按扩展名写成 CSV 或 Excel）"""
+        if _is_csv(output_file):
+            pd.DataFrame(columns=columns).to_csv(output_file, index=False, encoding="utf-8-sig")
+        else:
+            pd.DataFrame(columns=columns).to_excel(output_file, index=False)
+
+    @staticmethod
+    def _cell_value(value: Any) -> Any:
+        """空值（None / NaN）写成空单元格，与 ``DataFrame.to_excel`` 一致"""
+        if value is None or (isinstance(value, float) and value != value):
+            return None
+        return value
+
+    def _append_rows(self, output_file: str, row_data: List[Union[Dict[str, Any], "ResultRow"]],
+                     columns: Optional[List[str]] = None) -> None:
         """
-        将 ``row_data`` 追加写入到 ``output_file``，支持自动创建及占用兜底。
+        用 openpyxl 在工作表末尾追加 ``row_data``：每次调用（即每个刷新批次，而非每行）完整解析一次工作簿、
+        追加后整体重写到临时文件再替换原文件，因此应按批调用。
+
+        列顺序以文件表头为准；文件不存在时按 ``columns``（缺省为首行的键）新建带表头的文件，
+        行中出现表头没有的键时补到表头末尾。``ResultRow`` 行的字段顺序与表头一致时按元组直接写入。
+        ``.csv`` 路径交给 ``_append_csv_rows``。
         """
-        try:
-            df_new = pd.DataFrame(row_data)
+        if _is_csv(output_file):
+            self._append_csv_rows(output_file, row_data, columns)
+            return
+
+        if os.path.exists(output_file):
+            wb = load_workbook(output_file)
+            ws = wb.active
+            header = [cell.value for cell in ws[1] if cell.value is not None]
+        else:
+            wb = Workbook()
+            ws = wb.active
+            ws.title = "Sheet1"
+            first = row_data[0] if row_data else ()
+            header = list(columns or (first._fields if isinstance(first, ResultRow) else first))
+            ws.append(header)
 
-            # 1️⃣ 文件不存在：直接写
-            if not os.path.exists(output_file):
-                df_new.to_excel(output_file, index=False)
-                return
+        if header == self.EXCEL_COLUMNS_MATCHED:
+            rows = row_data
+        else:
+            # 表头与 ResultRow 不一致（旧文件）时退回按列名写入
+            rows = [row._asdict() if isinstance(row, ResultRow) else row for row in row_data]
 
-            # 2️⃣ 文件存在：读取 + 合并 + 写回
-            try:
-                df_exist = pd.read_excel(output_file)
-                df_combined = pd.concat([df_exist, df_new], ignore_index=True)
-                df_combined.to_excel(output_file, index=False)
-            except PermissionError:  # 常见于文件被 Excel 占用
-                temp_file = f"{output_file}.temp"
-                df_new.to_excel(temp_file, index=False)
-                print(f"原文件被占用，数据已保存到临时文件：{temp_file}")
+        known = set(header)
+        for row in rows:
+            if isinstance(row, ResultRow):
+                continue
+            for key in row:
+                if key not in known:
+                    known.add(key)
+                    header.append(key)
+                    ws.cell(row=1, column=len(header), value=key)
+
+        cell_value = self._cell_value
+        for row in rows:
+            if isinstance(row, ResultRow):
+                ws.append([cell_value(value) for value in row])
+            else:
+                ws.append([cell_value(row.get(col)) for col in header])
+        # 先完整写到临时文件再原子替换，写到一半中断也不会损坏原文件
+        temp_file = f"{output_file}.tmp"
+        wb.save(temp_file)
+        os.replace(temp_file, output_file)
+
+    def _append_csv_rows(self, output_file: str, row_data: List[Union[Dict[str, Any], "ResultRow"]],
+                         columns: Optional[List[str]] = None) -> None:
+        """
+        在 CSV 文件末尾追加 ``row_data``（UTF-8 带 BOM，Excel 可直接打开），表头规则同 ``_append_rows``。
+
+        只有行中出现表头没有的键时才需要重写整个文件（临时文件 + 原子替换），其余情况直接追加。
+        """
+        rows = [row._asdict() if isinstance(row, ResultRow) else row for row in row_data]
+        header = None
+        if os.path.exists(output_file) and os.path.getsize(output_file):
+            with open(output_file, newline="", encoding="utf-8-sig") as f:
+                header = next(csv.reader(f), None)
+        is_new = not header
+        if is_new:
+            first = row_data[0] if row_data else ()
+            header = list(columns or (first._fields if isinstance(first, ResultRow) else first))
+
+        known = set(header)
+        extra = []
+        for row in rows:
+            for key in row:
+                if key not in known:
+                    known.add(key)
+                    extra.append(key)
+
+        cell_value = self._cell_value
+        rows = [{key: cell_value(value) for key, value in row.items()} for row in rows]
+        if extra and not is_new:
+            # 表头变化：连同已有数据整体重写
+            with open(output_file, newline="", encoding="utf-8-sig") as f:
+                rows = list(csv.DictReader(f)) + rows
+            temp_file = f"{output_file}.tmp"
+            with open(temp_file, "w", newline="", encoding="utf-8-sig") as f:
+                writer = csv.DictWriter(f, fieldnames=header + extra)
+                writer.writeheader()
+                writer.writerows(rows)
+            os.replace(temp_file, output_file)
+            return
+
+        with open(output_file, "a", newline="", encoding="utf-8-sig") as f:
+            writer = csv.DictWriter(f, fieldnames=header + extra)
+            if is_new:
+                writer.writeheader()
+            writer.writerows(rows)
+
+    def append_to_excel(self, row_data: List[Union[Dict[str, Any], "ResultRow"]], output_file: str) -> bool:
+        """
+        将 ``row_data`` 追加写入到 ``output_file``（临时文件 + 原子替换），支持自动创建。
+
+        原文件被占用导致替换失败时保留 ``.tmp`` 临时文件，其中是包含本批数据的完整结果。
+
+        Returns:
+            是否写入了 ``output_file`` 本身
+        """
+        try:
+            self._append_rows(output_file, row_data)
+            return True
+        except PermissionError:  # 常见于文件被 Excel 占用
+            temp_file = f"{output_file}.tmp"
+            if os.path.exists(temp_file):
+                print(f"原文件被占用，完整数据已保存到临时文件：{temp_file}")
+            else:
+                print(f"原文件被占用，本批 {len(row_data)} 行未能写入：{output_file}")
         except Exception as exc:
-            # 兜底打印 & 备份
             print(f"保存数据时发生错误: {exc}")
-            backup_file = f"{output_file}.backup"
-            pd.DataFrame(row_data).to_excel(backup_file, index=False)
-            print(f"数据已保存到备用文件：{backup_file}")
+        return False
+
+    def append_to_excel_buffered(self, row_data: List[Union[Dict[str, Any], "ResultRow"]],
+                                 output_file: str) -> None:
+        """
+        缓冲写入：先把 ``row_data`` 放入内存，积攒满 ``_flush_every`` 行再一次性追加到文件，
+        流程结束时需调用 ``flush`` 写出剩余的行。
+        """
+        pending = self._pending_rows.setdefault(output_file, [])
+        pending.extend(row_data)
+        if len(pending) >= self._flush_every:
+            self.flush(output_file)
+
+    def flush(self, output_file: Optional[str] = None) -> None:
+        """写出缓冲中的行；不指定 ``output_file`` 时写出全部文件"""
+        files = [output_file] if output_file is not None else list(self._pending_rows)
+        for file in files:
+            pending = self._pending_rows.pop(file, None)
+            if not pending:
+                continue
+            if not self.append_to_excel(pending, file):
+                # 写入失败的行放回缓冲，下次 flush 时连同新行一起重试（原文件未变，不会重复）
+                self._pending_rows[file] = pending + self._pending_rows.get(file, [])
+                continue
+            # 写入成功后同步追加 ID 日志，下次启动直接读日志，不必解析整个输出文件
+            self._append_lines(self.processed_ids_log(file), [
+                str(row.bgm_id) if isinstance(row, ResultRow) else str(row["bgm_id"])
+                for row in pending if isinstance(row, ResultRow) or "bgm_id" in row
+            ])
 
     def append_unmatched_to_excel(self, name: str, unmatched_file: str) -> None:
-        """记录未匹配成功的 Bangumi 名称。"""
-        df = pd.DataFrame([[name]], columns=["原始的未匹配bgm产品名称"])
-        if not os.path.exists(unmatched_file):
-            df.to_excel(unmatched_file, index=False)
-        else:
-            with pd.ExcelWriter(unmatched_file, mode="a", engine="openpyxl", if_sheet_exists="overlay") as writer:
-                sheet = writer.book["Sheet1"]
-                df.to_excel(writer, index=False, header=False, startrow=sheet.max_row)
+        """记录未匹配成功的 Bangumi 名称（缓冲写入，需在结束时调用 ``flush``）。"""
+        self.append_to_excel_buffered([{"原始的未匹配bgm产品名称": name}], unmatched_file)
 
     def append_org_to_excel(self, org_info: Dict[str, Any], output_file: str) -> None:
-        """将会社信息写入文件，逻辑同 ``append_to_excel``。"""
-        self.append_to_excel([org_info], output_file)
+        """将会社信息写入文件，逻辑同 ``append_to_excel``，写入成功后追加会社日志。"""
+        # 接口返回的详情以 id 作为会社ID，写入时统一补上 org_id 列
+        row = {"org_id": str(org_info.get("org_id", org_info.get("id", ""))), **org_info}
+        if self.append_to_excel([row], output_file):
+            self._append_lines(self.processed_orgs_log(output_file),
+                               [orjson.dumps(row, option=orjson.OPT_SERIALIZE_NUMPY, default=str).decode()])
     
-    def read_bgm_data(self, input_file: str) -> pd.DataFrame:
-        """读取原始产品源文件"""
-        df_bgm = pd.read_excel(input_file, engine="openpyxl")
+    def read_bgm_data(self, input_file: str, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """
+        读取原始产品源文件
+
+        Args:
+            input_file: 源文件路径
+            columns: 只读取这些列（不存在的列忽略）；为 ``None`` 时读取全部列
+        """
+        usecols = None
+        if columns is not None:
+            wanted = frozenset(columns)
+            usecols = wanted.__contains__
+        df_bgm = pd.read_excel(input_file, engine=_EXCEL_READ_ENGINE, usecols=usecols, dtype=self.SOURCE_DTYPES)
         print(f"DEBUG: 识别到的 Excel 列名：{df_bgm.columns.tolist()}")
         
-        return df_bgm
+        return self._downcast_integers(df_bgm)
+    
+    def iter_bgm_rows(self, input_file: str, columns: Iterable[str]) -> Iterator[Tuple[Any, ...]]:
+        """
+        逐行读取原始产品源文件，产出 ``columns`` 各列值组成的元组（缺失的列、空单元格为 ``None``）。
+
+        安装了 python-calamine 时流式解析，不构建整张表；否则读取 DataFrame 后逐行产出。
+        """
+        columns = list(columns)
+        if not _HAS_CALAMINE:
+            df_bgm = self.read_bgm_data(input_file, columns=columns).reindex(columns=columns)
+            yield from df_bgm.astype(object).where(df_bgm.notna(), None).itertuples(index=False, name=None)
+            return
+        
+        from python_calamine import CalamineWorkbook
+        
+        rows = CalamineWorkbook.from_path(input_file).get_sheet_by_index(0).iter_rows()
+        header = next(rows, [])
+        print(f"DEBUG: 识别到的 Excel 列名：{header}")
+        positions = [header.index(column) if column in header else None for column in columns]
+        for values in rows:
+            yield tuple(
+                _calamine_value(values[pos]) if pos is not None and pos < len(values) else None
+                for pos in positions
+            )
     
     def read_bgm_data_with_aliases(self, input_file: str) -> pd.DataFrame:
         """读取包含别名的原始产品源文件"""
-        df_bgm = pd.read_excel(input_file, engine="openpyxl")
+        df_bgm = pd.read_excel(input_file, engine=_EXCEL_READ_ENGINE, dtype=self.SOURCE_DTYPES)
         print(f"DEBUG: 识别到的 Excel 列名：{df_bgm.columns.tolist()}")
-        return df_bgm
+        return self._downcast_integers(df_bgm)
     
-    def get_processed_ids(self, output_file: str) -> set:
-        """获取已处理的ID集合，用于断点续跑"""
-        processed_ids = set()
-        if os.path.exists(output_file):
-            try:
-                df_exist = pd.read_excel(output_file, engine="openpyxl")
-                if 'id' in df_exist.columns:
-                    processed_ids = set(df_exist["id"].dropna().astype(str))
-                else:
-                    print("警告: 输出文件中未找到 'id' 列，断点续跑可能不准确。")
-            except Exception as exc:
-                print("读取已匹配文件失败，将重新创建：", exc)
+    @staticmethod
+    def _downcast_integers(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        整数列按实际取值范围缩小位宽（如 int64 -> int16），减少内存占用。
+
+        浮点列（分数等）保持 float64：降为 float32 会改变与接口得分比较的结果。
+        先收集转换后的列再一次性 ``assign``，避免逐列原地覆盖产生的重复拷贝。
+        """
+        int_columns = df.select_dtypes(include="integer").columns
+        if int_columns.empty:
+            return df
+        return df.assign(**{
+            str(column): pd.to_numeric(df[column], downcast="integer") for column in int_columns
+        })
+    
+    @staticmethod
+    def bgm_id_column(df: pd.DataFrame, column: str) -> pd.Series:
+        """ID 列转为字符串，缺失时以 ``ROW_<行号>`` 兜底（兜底值只为缺失行生成）"""
+        if column not in df.columns:
+            return pd.Series("ROW_" + df.index.astype(str), index=df.index)
+        
+        bgm_ids = df[column].astype(str)
+        missing = df[column].isna()
+        if missing.any():
+            bgm_ids[missing] = "ROW_" + df.index[missing].astype(str)
+        return bgm_ids
+    
+    @staticmethod
+    def text_column(df: pd.DataFrame, column: str) -> pd.Series:
+        """文本列去除首尾空白，缺失值记为空字符串"""
+        return df[column].astype(str).str.strip().where(df[column].notna(), "")
+    
+    @staticmethod
+    def processed_ids_log(output_file: str) -> str:
+        """输出文件对应的已处理 ID 日志路径（追加写入，每行一个 ID）"""
+        return f"{output_file}.ids"
+    
+    def get_processed_ids(self, output_file: str) -> frozenset:
+        """
+        获取已处理的ID集合，用于断点续跑。
+
+        优先读取 ID 日志；日志缺失或比输出文件旧（输出文件被单独修改过）时，
+        回退为读取输出文件的 ID 列，并据此重建日志。
+        """
+        processed_ids = frozenset()
+        if not os.path.exists(output_file):
+            return processed_ids
+        
+        id_log = self.processed_ids_log(output_file)
+        if os.path.exists(id_log) and os.path.getmtime(id_log) >= os.path.getmtime(output_file):
+            with open(id_log, encoding="utf-8") as f:
+                return frozenset(line for line in f.read().splitlines() if line)
+        
+        try:
+            # 输出文件的 ID 列为 bgm_id，兼容旧文件中的 id 列
+            df_exist = self._read_output(output_file, dtype=str,
+                                         usecols=lambda col: col in ("bgm_id", "id"))
+            id_col = next((col for col in ("bgm_id", "id") if col in df_exist.columns), None)
+            if id_col:
+                processed_ids = frozenset(df_exist[id_col].dropna())
+                self._rewrite_log(id_log, processed_ids)
+            else:
+                print("警告: 输出文件中未找到 'bgm_id' 列，断点续跑可能不准确。")
+        except Exception as exc:
+            print("读取已匹配文件失败，将重新创建：", exc)
         return processed_ids
     
+    @staticmethod
+    def _read_output(output_file: str, dtype=None, usecols=None) -> pd.DataFrame:
+        """读取输出文件；路径为 ``.csv`` / ``.parquet``（异步模式）时按对应格式读取，参数语义与 ``read_excel`` 一致"""
+        if _is_csv(output_file):
+            return pd.read_csv(output_file, dtype=dtype, usecols=usecols, encoding="utf-8-sig")
+        if not output_file.lower().endswith(".parquet"):
+            return pd.read_excel(output_file, engine=_EXCEL_READ_ENGINE, dtype=dtype, usecols=usecols)
+        
+        df = pd.read_parquet(output_file)
+        if usecols is not None:
+            df = df[[col for col in df.columns if usecols(col)]]
+        if dtype is not None:
+            # 与 read_excel 一致：空值保持为空，不转换成 "None" / "nan"
+            df = df.astype(dtype).where(df.notna(), None)
+        return df
+    
+    @staticmethod
+    def _rewrite_log(log_path: str, lines: Iterable[str]) -> None:
+        """整体重写日志（先写临时文件再替换，避免中途失败留下残缺日志）"""
+        temp_file = f"{log_path}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            f.writelines(f"{line}\n" for line in lines)
+        os.replace(temp_file, log_path)
+    
+    @staticmethod
+    def _append_lines(log_path: str, lines: List[str]) -> None:
+        """向日志追加若干行"""
+        if lines:
+            with open(log_path, "a", encoding="utf-8") as f:
+                f.writelines(f"{line}\n" for line in lines)
+    
+    @staticmethod
+    def processed_orgs_log(org_output_file: str) -> str:
+        """会社信息文件对应的会社日志路径（追加写入，每行一条 JSON，后写入的覆盖先写入的）"""
+        return f"{org_output_file}.orgs.jsonl"
+    
     def get_processed_orgs(self, org_output_file: str) -> Dict[str, Dict[str, Any]]:
-        """获取已处理的会社信息，用于避免重复查询"""
+        """
+        获取已处理的会社信息，用于避免重复查询。
+
+        与 ``get_processed_ids`` 相同：优先读取会社日志，日志缺失或比会社信息文件旧时
+        回退为解析会社信息文件，并据此重建日志。
+        """
         processed_orgs = {}
-        if os.path.exists(org_output_file):
-            try:
-                org_df = pd.read_excel(org_output_file, engine="openpyxl")
-                for _, row in org_df.iterrows():
-                    org_id = str(row["org_id"])
-                    if pd.notna(org_id):
-                        processed_orgs[org_id] = {
-                            "info": row.to_dict(),
-                            "retry_count": 0
-                        }
-            except Exception as exc:
-                print("读取会社信息文件失败，将重新创建：", exc)
-        return processed_orgs 
\ No newline at end of file
+        if not os.path.exists(org_output_file):
+            return processed_orgs
+        
+        org_log = self.processed_orgs_log(org_output_file)
+        if os.path.exists(org_log) and os.path.getmtime(org_log) >= os.path.getmtime(org_output_file):
+            with open(org_log, "rb") as f:
+                for line in f:
+                    if line.strip():
+                        info = orjson.loads(line)
+                        processed_orgs[info["org_id"]] = {"info": info, "retry_count": 0}
+            return processed_orgs
+        
+        try:
+            # org_id 按字符串读取，与接口返回的 ``str(orgId)`` 保持一致（避免空值导致变成 "5.0"）
+            org_df = self._read_output(org_output_file, dtype={"org_id": str})
+            # to_dict("records") 一次性生成全部行字典，会社ID直接从行字典中取
+            records = org_df[org_df["org_id"].notna()].to_dict("records")
+            processed_orgs = {info["org_id"]: {"info": info, "retry_count": 0} for info in records}
+            self._rewrite_log(org_log, (
+                orjson.dumps(info, option=orjson.OPT_SERIALIZE_NUMPY, default=str).decode()
+                for info in records
+            ))
+        except Exception as exc:
+            print("读取会社信息文件失败，将重新创建：", exc)
+        return processed_orgs
+
+
+# 匹配结果行，字段顺序与 ``EXCEL_COLUMNS_MATCHED`` 一致，可按元组直接写入工作表
+ResultRow = namedtuple("ResultRow", DataProcessor.EXCEL_COLUMNS_MATCHED)
@@ -1,44 +1,275 @@
-import time
+import csv
+import unicodedata
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from difflib import SequenceMatcher
-from typing import List, Dict, Any, Optional, Tuple
+from importlib.util import find_spec
+from typing import List, Dict, Any, Iterable, Optional, Tuple
 from tqdm import tqdm
 
 from ..api.api_client import YMGalAPIClient
-from ..data.data_processor import DataProcessor
+from ..data.data_processor import DataProcessor, ResultRow
+from ..utils.logger import Logger
+from ..utils.rate_limiter import TokenBucket
+
+
+# rapidfuzz 为 C++ 实现的字符串相似度计算，比纯 Python 的 difflib 快一个数量级；未安装时回退到 difflib
+_HAS_RAPIDFUZZ = find_spec("rapidfuzz") is not None
+if _HAS_RAPIDFUZZ:
+    from rapidfuzz import fuzz, process
 
 
 class MatchingEngine:
     """匹配引擎，负责产品匹配逻辑"""
     
+    SIMILARITY_THRESHOLD = 0.8  # 名称对齐的最低相似度
+    
+    # 别名匹配时保留的原始匹配列（别名未能提高分数时回写原始结果）
+    ALIAS_ORIGINAL_COLUMNS = [
+        "bgm产品", "原始bgm产品名称",
+        "name", "chineseName", "ym_id",
+        "orgId", "orgName", "orgWebsite", "orgDescription"
+    ]
+    
+    # 名称对齐结果（CSV）的列
+    TARGET_SOURCE_COLUMNS = [
+        "target_id", "target_name", "target_chinese_name",
+        "source_id", "source_name", "source_score", "source_rank", "source_votes", "source_summary",
+        "match_score"
+    ]
+    
+    ORG_MAX_QUERIES = 3     # 会社信息不完整时每个会社最多查询的次数
+    MAX_WORKERS = 8         # 并发搜索的线程数
+    API_CALLS_PER_SECOND = 20.0  # 所有线程合计每秒最多发起的接口调用数
+    
     def __init__(self, api_client: YMGalAPIClient, data_processor: DataProcessor):
         self.api_client = api_client
         self.data_processor = data_processor
+        self.logger = Logger(silent_mode=True)
+        # 线程池共享的令牌桶，每次调用接口前取令牌，按全局速率限流
+        self._api_limiter = TokenBucket(self.API_CALLS_PER_SECOND)
+    
+    @staticmethod
+    def normalize_name(name: str) -> str:
+        """名称归一化：NFKC（全角 / 半角字母数字、假名统一）后忽略大小写"""
+        return unicodedata.normalize("NFKC", name).casefold()
+    
+    def _best_source_matches(self, target_names: List[str],
+                             source_names: List[str]) -> List[Tuple[Optional[int], float]]:
+        """
+        为每个目标名称查找最相似的原始名称，返回与 ``target_names`` 等长的 (下标, 得分) 列表；
+        低于阈值时下标为 ``None``。两侧名称须已用 ``normalize_name`` 归一化（由调用方统一预处理一次）。
+
+        与某个原始名称完全相同的目标直接取第一个相同的原始名称（得分 1.0），不参与相似度计算；
+        其余目标按长度分块，只与长度上可能达到阈值的原始名称比较：安装了 rapidfuzz 时每块用 ``process.cdist``
+        算出相似度矩阵，否则逐对用 ``SequenceMatcher`` 计算。
+        """
+        if not source_names:
+            return [(None, 0.0)] * len(target_names)
+        
+        first_index: Dict[str, int] = {}
+        for index, source_name in enumerate(source_names):
+            first_index.setdefault(source_name, index)
+        
+        matches: List[Tuple[Optional[int], float]] = [(None, 0.0)] * len(target_names)
+        pending: List[int] = []
+        for row_pos, target_name in enumerate(target_names):
+            index = first_index.get(target_name)
+            if index is not None:
+                matches[row_pos] = (index, 1.0)
+            else:
+                pending.append(row_pos)
+        if not pending:
+            return matches
+        
+        # 长度分块：ratio 不超过 2·min(a, b) / (a + b)，长度为 L 的目标只可能与长度在
+        # [L·t / (2 - t), L·(2 - t) / t] 内的原始名称达到阈值 t。原始名称按长度排序一次，之后二分取出候选区间
+        threshold = self.SIMILARITY_THRESHOLD
+        source_lengths = np.fromiter((len(name) for name in source_names), dtype=np.int64, count=len(source_names))
+        order = np.argsort(source_lengths, kind="stable")
+        sorted_lengths = source_lengths[order]
+
+        def candidates_for(length: int) -> np.ndarray:
+            """长度上可能达到阈值的原始名称下标（按原顺序，得分相同时仍取第一个）"""
+            # 留出浮点误差余量，边界上的候选交给后续精确计算判断
+            low = np.searchsorted(sorted_lengths, length * threshold / (2 - threshold) - 1e-9, side="left")
+            high = np.searchsorted(sorted_lengths, length * (2 - threshold) / threshold + 1e-9, side="right")
+            return np.sort(order[low:high])
+
+        by_length: Dict[int, List[int]] = {}
+        for row_pos in pending:
+            by_length.setdefault(len(target_names[row_pos]), []).append(row_pos)
+
+        if _HAS_RAPIDFUZZ:
+            # 每个长度分块调用一次 cdist（C++ 多线程计算，释放 GIL），只计算块内的候选，矩阵也小得多；
+            # 低于阈值的得分记为 0，只影响未命中的行
+            for length, row_positions in by_length.items():
+                candidates = candidates_for(length)
+                if not len(candidates):
+                    continue
+                scores = process.cdist([target_names[row_pos] for row_pos in row_positions],
+                                       [source_names[index] for index in candidates.tolist()],
+                                       scorer=fuzz.ratio, score_cutoff=threshold * 100, workers=-1)
+                best_columns = scores.argmax(axis=1)
+                best_scores = scores[np.arange(len(row_positions)), best_columns] / 100.0
+                for row_pos, column, score in zip(row_positions, best_columns, best_scores):
+                    matches[row_pos] = (int(candidates[column]) if score >= threshold else None, float(score))
+            return matches
+        
+        matcher = SequenceMatcher(None)
+        for length, row_positions in by_length.items():
+            candidates = candidates_for(length).tolist()
+            for row_pos in row_positions:
+                # SequenceMatcher 缓存第二个序列的字符索引：目标名称作为 seq2 只建一次索引
+                matcher.set_seq2(target_names[row_pos])
+                best_index, best_score = None, 0.0
+                for index in candidates:
+                    matcher.set_seq1(source_names[index])
+                    # 按字符计数的上界同样不小于 ratio，达不到阈值或无法超过当前最高分时跳过完整计算
+                    bound = matcher.quick_ratio()
+                    if bound < threshold or bound <= best_score:
+                        continue
+                    score = matcher.ratio()
+                    if score > best_score:
+                        best_index, best_score = index, score
+                matches[row_pos] = (best_index if best_score >= threshold else None, best_score)
+        return matches
+    
+    def _search(self, keyword: str) -> List[Dict[str, Any]]:
+        """
+        搜索目标平台，只返回得分最高的一条（调用方只用首条结果）。
+
+        只有缓存未命中、需要发起请求时才从令牌桶取令牌，命中缓存的关键词不占用接口配额。
+        """
+        if not self.api_client.is_search_cached(keyword):
+            self._api_limiter.acquire()
+        return self.api_client.search_ym_top_matches(keyword, top_k=1)
+    
+    def _org_details(self, org_id: str) -> Optional[Dict[str, Any]]:
+        """查询会社详情；与 ``_search`` 相同，只有缓存未命中时才从令牌桶取令牌"""
+        if not self.api_client.is_org_cached(org_id):
+            self._api_limiter.acquire()
+        return self.api_client.get_organization_details(org_id)
+    
+    def _search_best_match(self, task: Tuple[str, str, str]) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        在工作线程中执行：分别搜索日文名、中文名，返回 (得分最高的匹配, 匹配来源)。
+
+        实际发起请求的搜索先从共享令牌桶取一个令牌，所有线程合计不超过 ``API_CALLS_PER_SECOND`` 次/秒。
+        """
+        _, jp_name, cn_name = task
+        if not jp_name and not cn_name:
+            return None, ""
+
+        best_match = None
+        best_score = -1.0  # 初始化最高得分
+        match_source = ""
+
+        # 尝试匹配日文名
+        if jp_name:
+            jp_matches = self._search(jp_name)
+            if jp_matches and jp_matches[0]["score"] > best_score:
+                best_match = jp_matches[0]
+                best_score = best_match["score"]
+                match_source = "日文名"
+
+        # 尝试匹配中文名
+        if cn_name:
+            cn_matches = self._search(cn_name)
+            if cn_matches and cn_matches[0]["score"] > best_score:
+                best_match = cn_matches[0]
+                match_source = "中文名"
+
+        return best_match, match_source
+    
+    def _search_best_alias(self, alias_values: Tuple[Any, ...]) -> Tuple[Optional[Dict[str, Any]], float, str]:
+        """
+        在工作线程中执行：逐个搜索一行的别名，返回 (得分最高的匹配, 得分, 匹配来源)，无匹配时得分为 -1。
+
+        同一行内忽略大小写重复的别名只查询一次（得分相同，严格大于比较下重复项不会胜出）。
+        """
+        aliases = [alias for alias in (str(value).strip() for value in alias_values if pd.notna(value)) if alias]
+
+        best_match = None
+        best_score = -1.0  # 初始化别名匹配的最高分
+        match_source = ""
+
+        seen = set()
+        for i, alias in enumerate(aliases):
+            key = alias.casefold()
+            if key in seen:
+                continue
+            seen.add(key)
+            matches = self._search(alias)
+            if matches and matches[0]["score"] > best_score:
+                best_match = matches[0]
+                best_score = best_match["score"]
+                match_source = f"别名{i+1}"
+
+        return best_match, best_score, match_source
+    
+    def _resolve_org(self, org_id: str, org_infos: Dict[str, Dict[str, Any]], org_queries: Dict[str, int],
+                     org_output_file: str) -> Optional[Dict[str, Any]]:
+        """
+        取得会社信息：已有完整信息（官网与简介）时直接返回；否则查询接口（每个会社最多 ``ORG_MAX_QUERIES`` 次），
+        查到的信息写入 ``org_infos`` 与会社信息文件。超过次数后返回已有的（不完整）信息，查询失败返回 ``None``。
+        """
+        if not org_id:
+            return None
+
+        existing = org_infos.get(org_id)
+        if existing and existing.get("website") and existing.get("description"):
+            return existing
+
+        queries = org_queries.get(org_id, 0) + 1
+        org_queries[org_id] = queries
+        if queries > self.ORG_MAX_QUERIES:
+            return existing
+
+        org_info = self._org_details(org_id)
+        # 与已有信息相同（重试没有拿到新内容）时不再重复写入会社信息文件
+        if org_info and org_info != existing:
+            org_infos[org_id] = org_info
+            self.data_processor.append_org_to_excel(org_info, org_output_file)
+        return org_info
     
-    def calculate_similarity(self, str1: str, str2: str) -> float:
-        """利用 ``difflib.SequenceMatcher`` 计算字符串相似度。"""
-        return SequenceMatcher(None, str1.lower(), str2.lower()).ratio()
+    def _basic_tasks(self, input_file: str, df_bgm: Optional[pd.DataFrame]) -> Iterable[Tuple[str, str, str]]:
+        """
+        产出每行的 (ID, 日文名, 中文名)：ID 缺失时为 ``ROW_<行号>``，名称去除首尾空白、缺失为空字符串。
+
+        已提供 ``df_bgm`` 时按列整体转换后 zip，避免 iterrows 逐行构建 Series；
+        否则流式逐行读取源文件，不在内存中构建整张表。
+        """
+        if df_bgm is not None:
+            return zip(self.data_processor.bgm_id_column(df_bgm, "id"),
+                       self.data_processor.text_column(df_bgm, "日文名"),
+                       self.data_processor.text_column(df_bgm, "中文名"))
+        return (
+            (str(raw_id) if raw_id is not None else f"ROW_{row_pos}",
+             str(jp_name).strip() if jp_name is not None else "",
+             str(cn_name).strip() if cn_name is not None else "")
+            for row_pos, (raw_id, jp_name, cn_name)
+            in enumerate(self.data_processor.iter_bgm_rows(input_file, ("id", "日文名", "中文名")))
+        )
     
     def match_bgm_products_and_save(
         self,
         input_file: str = "bgm_archive_20250525 (1).xlsx",
         output_file: str = "products_matched.xlsx",
         unmatched_file: str = "products_unmatched.xlsx",
-        org_output_file: str = "organizations_info.xlsx"
+        org_output_file: str = "organizations_info.xlsx",
+        df_bgm: Optional[pd.DataFrame] = None
     ) -> None:
         """
         读取原始数据Excel -> 目标平台搜索匹配 -> 写结果
         支持 **断点续跑** ：已处理过的原始名称会跳过。
+
+        ``df_bgm`` 为已读取的源表时直接使用，不再解析 ``input_file``。
         """
-        # 1. 读取原始源文件
-        df_bgm = self.data_processor.read_bgm_data(input_file)
-        
-        product_names_cn: List[str] = df_bgm["中文名"].dropna().astype(str).tolist()
-        
-        # 2. 加载已处理过的 ID (用于断点续跑)
-        processed_ids = self.data_processor.get_processed_ids(output_file)
+        # 1. 源文件在收集任务时逐行读取（已提供 ``df_bgm`` 时直接使用）
 
-        # 3. 初始化输出文件 & token
+        # 2. 初始化 token & 输出文件（损坏的输出文件会被重建，同时删除对应的 ID 日志）
         if not self.api_client.initialize_token():
             print("无法获取 token，流程终止")
             return
@@ -46,91 +277,57 @@ class MatchingEngine:
         self.data_processor.init_excel(output_file)
         self.data_processor.init_org_excel(org_output_file)
 
-        # 4. 加载已有公司信息到内存，避免重复查询
-        processed_orgs = self.data_processor.get_processed_orgs(org_output_file)
-
-        # 5. 遍历原始数据行并匹配
-        for idx, row in tqdm(df_bgm.iterrows(), total=len(df_bgm), desc="处理产品"):
-            bgm_id = str(row['id']) if 'id' in row and pd.notna(row['id']) else f"ROW_{idx}"
-            
-            if bgm_id in processed_ids:
-                continue
-
-            jp_name = str(row["日文名"]).strip() if pd.notna(row["日文名"]) else ""
-            cn_name = str(row["中文名"]).strip() if pd.notna(row["中文名"]) else ""
-
-            if not jp_name and not cn_name:
-                self.data_processor.append_unmatched_to_excel(f"ID_{bgm_id}_空名称", unmatched_file)
-                continue
-
-            best_match = None
-            best_score = -1.0  # 初始化最高得分
-            match_source = ""
-
-            # 尝试匹配日文名
-            if jp_name:
-                jp_matches = self.api_client.search_ym_top_matches(jp_name)
-                if jp_matches and jp_matches[0]["score"] > best_score:
-                    best_match = jp_matches[0]
-                    best_score = best_match["score"]
-                    match_source = "日文名"
-
-            # 尝试匹配中文名
-            if cn_name:
-                cn_matches = self.api_client.search_ym_top_matches(cn_name)
-                if cn_matches and cn_matches[0]["score"] > best_score:
-                    best_match = cn_matches[0]
-                    best_score = best_match["score"]
-                    match_source = "中文名"
-
-            if best_match:
-                row_list: List[Dict[str, Any]] = []
-                # ---- 公司信息处理 ----------------------------------------
-                org_id = str(best_match.get("orgId", ""))
-                org_info = None  # type: Optional[Dict[str, Any]]
-
-                if org_id:
-                    should_retry = False
-                    if org_id in processed_orgs:
-                        # 信息不完整时重试 (最多 3 次)
-                        existing = processed_orgs[org_id]["info"]
-                        if not existing.get("website") or not existing.get("description"):
-                            should_retry = True
-                            processed_orgs[org_id]["retry_count"] += 1
-                    else:
-                        should_retry = True
-                        processed_orgs[org_id] = {"info": {}, "retry_count": 1}
-
-                    if should_retry and processed_orgs[org_id]["retry_count"] <= 3:
-                        org_info = self.api_client.get_organization_details(org_id)
-                        if org_info:
-                            processed_orgs[org_id]["info"] = org_info
-                            self.data_processor.append_org_to_excel(org_info, org_output_file)
-                    else:
-                        org_info = processed_orgs[org_id]["info"]
-
-                # ---- 组装行数据 -----------------------------------------
-                row_data = {
-                    "bgm_id": bgm_id,
-                    "bgm产品": jp_name if jp_name else cn_name, # 使用非空的原始名称作为bgm产品
-                    "name": best_match["name"],
-                    "chineseName": best_match["chineseName"],
-                    "ym_id": best_match["ym_id"],
-                    "score": best_match["score"],
-                    "orgId": org_id,
-                    "orgName": (org_info or {}).get("name", best_match.get("orgName", "")),
-                    "orgWebsite": (org_info or {}).get("website", best_match.get("orgWebsite", "")),
-                    "orgDescription": (org_info or {}).get("description", best_match.get("orgDescription", "")),
-                    "匹配来源": match_source
-                }
-                row_list.append(row_data)
-
-                self.data_processor.append_to_excel(row_list, output_file)
-            else:
-                self.data_processor.append_unmatched_to_excel(f"ID_{bgm_id}_未匹配", unmatched_file)
+        # 3. 加载已处理过的 ID (用于断点续跑)；须在初始化输出文件之后，
+        #    否则会沿用已被丢弃的输出文件的 ID 日志，跳过实际上并未写入的行
+        processed_ids = self.data_processor.get_processed_ids(output_file)
 
-            # 避免触发接口限流
-            time.sleep(0.05)
+        # 4. 加载已有公司信息到内存，避免重复查询；信息与查询次数分开存放，各自只需一次查找
+        org_infos = {org_id: entry["info"]
+                     for org_id, entry in self.data_processor.get_processed_orgs(org_output_file).items()}
+        org_queries: Dict[str, int] = {}
+
+        # 5. 收集待处理的行（跳过已处理的 ID）
+        tasks: List[Tuple[str, str, str]] = [
+            task for task in self._basic_tasks(input_file, df_bgm) if task[0] not in processed_ids
+        ]
+
+        # 6. 搜索交给线程池并发执行，主线程按源表顺序处理结果（会社信息、写文件只在主线程进行）
+        executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS, thread_name_prefix="match")
+        try:
+            results = executor.map(self._search_best_match, tasks)
+            for (bgm_id, jp_name, cn_name), (best_match, match_source) in tqdm(
+                    zip(tasks, results), total=len(tasks), desc="处理产品", mininterval=0.5):
+                if not jp_name and not cn_name:
+                    self.data_processor.append_unmatched_to_excel(f"ID_{bgm_id}_空名称", unmatched_file)
+                    continue
+
+                if best_match:
+                    # ---- 公司信息处理 ----------------------------------------
+                    org_id = str(best_match.get("orgId", ""))
+                    org_info = self._resolve_org(org_id, org_infos, org_queries, org_output_file)
+
+                    # ---- 组装行数据 -----------------------------------------
+                    row_data = ResultRow(
+                        bgm_id=bgm_id,
+                        bgm产品=jp_name if jp_name else cn_name, # 使用非空的原始名称作为bgm产品
+                        name=best_match["name"],
+                        chineseName=best_match["chineseName"],
+                        ym_id=best_match["ym_id"],
+                        score=best_match["score"],
+                        orgId=org_id,
+                        orgName=(org_info or {}).get("name", best_match.get("orgName", "")),
+                        orgWebsite=(org_info or {}).get("website", best_match.get("orgWebsite", "")),
+                        orgDescription=(org_info or {}).get("description", best_match.get("orgDescription", "")),
+                        匹配来源=match_source
+                    )
+                    self.data_processor.append_to_excel_buffered([row_data], output_file)
+                else:
+                    self.data_processor.append_unmatched_to_excel(f"ID_{bgm_id}_未匹配", unmatched_file)
+        finally:
+            # 中途异常 / 中断时取消尚未开始的查询，不等待整张表跑完
+            executor.shutdown(wait=False, cancel_futures=True)
+            # 写出缓冲中剩余的结果与未匹配记录（中途异常 / 中断时也不丢失已处理的行）
+            self.data_processor.flush()
 
         print("\n所有匹配结果已保存。🎉")
     
@@ -148,10 +345,7 @@ class MatchingEngine:
         # 1. 读取原始源文件
         df_bgm = self.data_processor.read_bgm_data_with_aliases(input_file)
 
-        # 2. 加载已处理过的 ID (用于断点续跑)
-        processed_ids = self.data_processor.get_processed_ids(output_file)
-
-        # 3. 初始化输出文件 & token
+        # 2. 初始化 token & 输出文件（损坏的输出文件会被重建，同时删除对应的 ID 日志）
         if not self.api_client.initialize_token():
             print("无法获取 token，流程终止")
             return
@@ -159,101 +353,78 @@ class MatchingEngine:
         self.data_processor.init_excel(output_file)
         self.data_processor.init_org_excel(org_output_file)
 
-        # 4. 加载已有公司信息到内存，避免重复查询
-        processed_orgs = self.data_processor.get_processed_orgs(org_output_file)
-
-        # 5. 遍历原始数据行并匹配
-        for idx, row in tqdm(df_bgm.iterrows(), total=len(df_bgm), desc="处理产品"):
-            bgm_id = str(row['bgm_id']) if 'bgm_id' in row and pd.notna(row['bgm_id']) else f"ROW_{idx}"
-
-            if bgm_id in processed_ids:
-                continue
-
-            # 只用别名列进行匹配
-            alias_cols = [col for col in row.index if col.startswith("别名")]
-            aliases = [str(row[col]).strip() for col in alias_cols if pd.notna(row[col]) and str(row[col]).strip()]
-
-            # 1. 获取原始分数，并确保为浮点数，默认0
-            original_score = 0.0
-            if 'score' in row and pd.notna(row['score']):
-                try:
-                    original_score = float(row['score'])
-                except (ValueError, TypeError):
-                    pass # 如果转换失败，则保持0.0
-
-            # 2. 查找所有别名中的最佳匹配
-            best_match = None
-            best_score = -1.0  # 初始化别名匹配的最高分
-            match_source = ""
-
-            for i, alias in enumerate(aliases):
-                matches = self.api_client.search_ym_top_matches(alias)
-                if matches and matches[0]["score"] > best_score:
-                    best_match = matches[0]
-                    best_score = best_match["score"]
-                    match_source = f"别名{i+1}"
-
-            if best_match and best_score > original_score:
-                row_list: List[Dict[str, Any]] = []
-                # ---- 公司信息处理 (仅当别名更优时才查询) ----
-                org_id = str(best_match.get("orgId", ""))
-                org_info = None  # type: Optional[Dict[str, Any]]
-
-                if org_id:
-                    should_retry = False
-                    if org_id in processed_orgs:
-                        existing = processed_orgs[org_id]["info"]
-                        if not existing.get("website") or not existing.get("description"):
-                            should_retry = True
-                            processed_orgs[org_id]["retry_count"] += 1
-                    else:
-                        should_retry = True
-                        processed_orgs[org_id] = {"info": {}, "retry_count": 1}
-
-                    if should_retry and processed_orgs[org_id]["retry_count"] <= 3:
-                        org_info = self.api_client.get_organization_details(org_id)
-                        if org_info:
-                            processed_orgs[org_id]["info"] = org_info
-                            self.data_processor.append_org_to_excel(org_info, org_output_file)
-                    else:
-                        org_info = processed_orgs[org_id]["info"]
-
-                # ---- 组装新行数据 ----
-                row_data = {
-                    "bgm_id": bgm_id,
-                    "bgm产品": row.get('bgm产品') or row.get('原始bgm产品名称'),
-                    "name": best_match["name"],
-                    "chineseName": best_match["chineseName"],
-                    "ym_id": best_match["ym_id"],
-                    "score": best_score,
-                    "orgId": org_id,
-                    "orgName": (org_info or {}).get("name", best_match.get("orgName", "")),
-                    "orgWebsite": (org_info or {}).get("website", best_match.get("orgWebsite", "")),
-                    "orgDescription": (org_info or {}).get("description", best_match.get("orgDescription", "")),
-                    "匹配来源": match_source
-                }
-                row_list.append(row_data)
-                self.data_processor.append_to_excel(row_list, output_file)
-            else:
-                # ---- 组装原始行数据 ----
-                row_data = {
-                    "bgm_id": bgm_id,
-                    "bgm产品": row.get('bgm产品') or row.get('原始bgm产品名称'),
-                    "name": row.get('name'),
-                    "chineseName": row.get('chineseName'),
-                    "ym_id": row.get('ym_id'),
-                    "score": original_score,
-                    "orgId": row.get('orgId'),
-                    "orgName": row.get('orgName'),
-                    "orgWebsite": row.get('orgWebsite'),
-                    "orgDescription": row.get('orgDescription'),
-                    "匹配来源": "原始"
-                }
-                row_list = [row_data]
-                self.data_processor.append_to_excel(row_list, output_file)
+        # 3. 加载已处理过的 ID (用于断点续跑)；须在初始化输出文件之后，
+        #    否则会沿用已被丢弃的输出文件的 ID 日志，跳过实际上并未写入的行
+        processed_ids = self.data_processor.get_processed_ids(output_file)
 
-            # 避免触发接口限流
-            time.sleep(0.001)
+        # 4. 加载已有公司信息到内存，避免重复查询；信息与查询次数分开存放，各自只需一次查找
+        org_infos = {org_id: entry["info"]
+                     for org_id, entry in self.data_processor.get_processed_orgs(org_output_file).items()}
+        org_queries: Dict[str, int] = {}
+
+        # 5. 一次性过滤掉已处理的行，再按列预先提取各行所需的数据，避免 iterrows 逐行构建 Series
+        bgm_ids = self.data_processor.bgm_id_column(df_bgm, "bgm_id")
+        pending = ~bgm_ids.isin(processed_ids)
+        df_bgm, bgm_ids = df_bgm[pending], bgm_ids[pending]
+        # 只用别名列进行匹配；别名列只确定一次
+        alias_cols = [col for col in df_bgm.columns if str(col).startswith("别名")]
+        alias_rows = df_bgm[alias_cols].itertuples(index=False, name=None)
+        # 原始分数转为浮点数，缺失或无法转换时为 0
+        if "score" in df_bgm.columns:
+            original_scores = pd.to_numeric(df_bgm["score"], errors="coerce").fillna(0.0)
+        else:
+            original_scores = pd.Series(0.0, index=df_bgm.index)
+        # 别名未能提高分数时回写的原始列（缺失的列在 get 时为 None）
+        original_rows = df_bgm[df_bgm.columns.intersection(self.ALIAS_ORIGINAL_COLUMNS)].to_dict("records")
+
+        # 6. 别名搜索交给线程池并发执行，主线程按源表顺序处理结果（会社信息、写文件只在主线程进行）
+        executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS, thread_name_prefix="match")
+        try:
+            results = executor.map(self._search_best_alias, alias_rows)
+            for bgm_id, (best_match, best_score, match_source), original_score, row in tqdm(
+                    zip(bgm_ids, results, original_scores, original_rows), total=len(df_bgm), desc="处理产品",
+                    mininterval=0.5):
+                if best_match and best_score > original_score:
+                    # ---- 公司信息处理 (仅当别名更优时才查询) ----
+                    org_id = str(best_match.get("orgId", ""))
+                    org_info = self._resolve_org(org_id, org_infos, org_queries, org_output_file)
+
+                    # ---- 组装新行数据 ----
+                    row_data = ResultRow(
+                        bgm_id=bgm_id,
+                        bgm产品=row.get('bgm产品') or row.get('原始bgm产品名称'),
+                        name=best_match["name"],
+                        chineseName=best_match["chineseName"],
+                        ym_id=best_match["ym_id"],
+                        score=best_score,
+                        orgId=org_id,
+                        orgName=(org_info or {}).get("name", best_match.get("orgName", "")),
+                        orgWebsite=(org_info or {}).get("website", best_match.get("orgWebsite", "")),
+                        orgDescription=(org_info or {}).get("description", best_match.get("orgDescription", "")),
+                        匹配来源=match_source
+                    )
+                    self.data_processor.append_to_excel_buffered([row_data], output_file)
+                else:
+                    # ---- 组装原始行数据 ----
+                    row_data = ResultRow(
+                        bgm_id=bgm_id,
+                        bgm产品=row.get('bgm产品') or row.get('原始bgm产品名称'),
+                        name=row.get('name'),
+                        chineseName=row.get('chineseName'),
+                        ym_id=row.get('ym_id'),
+                        score=original_score,
+                        orgId=row.get('orgId'),
+                        orgName=row.get('orgName'),
+                        orgWebsite=row.get('orgWebsite'),
+                        orgDescription=row.get('orgDescription'),
+                        匹配来源="原始"
+                    )
+                    self.data_processor.append_to_excel_buffered([row_data], output_file)
+        finally:
+            # 中途异常 / 中断时取消尚未开始的查询，不等待整张表跑完
+            executor.shutdown(wait=False, cancel_futures=True)
+            # 写出缓冲中剩余的结果与未匹配记录（中途异常 / 中断时也不丢失已处理的行）
+            self.data_processor.flush()
 
         print("\n所有匹配结果已保存。🎉")
     
@@ -272,25 +443,29 @@ class MatchingEngine:
         target_df = pd.read_excel(target_file)
         source_df = pd.read_excel(source_file)
 
-        results = []
-
-        # 2. 遍历目标平台条目
-        for _, target_row in target_df.iterrows():
-            target_name = target_row["name"]
-            target_cn_name = target_row["chineseName"]
-            target_id = target_row["ym_id"]
-
-            best_match, best_score = None, 0.0
-            for _, source_row in source_df.iterrows():
-                score = self.calculate_similarity(target_name, source_row["产品名称"])
-                if score > best_score:
-                    best_match, best_score = source_row, score
-
-            if best_match is not None and best_score >= 0.8:
-                results.append({
-                    "target_id": target_id,
+        # 名称只转换、归一化一次，相似度计算时不再逐对处理；输出仍使用原始名称
+        source_names = source_df["产品名称"].astype(str).map(self.normalize_name).tolist()
+
+        # 2. 计算每个目标平台条目的最佳原始条目，只遍历命中的条目
+        target_names = target_df["name"].astype(str).map(self.normalize_name).tolist()
+        matches = self._best_source_matches(target_names, source_names)
+
+        # 3. 命中的条目逐行写入 CSV，中途出错时已写出的结果仍保留
+        matched_count = 0
+        with open(output_file, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=self.TARGET_SOURCE_COLUMNS)
+            writer.writeheader()
+            for row_pos, (best_index, best_score) in enumerate(matches):
+                if best_index is None:
+                    continue
+
+                target_row = target_df.iloc[row_pos]
+                target_name = target_row["name"]
+                best_match = source_df.iloc[best_index]
+                record = {
+                    "target_id": target_row["ym_id"],
                     "target_name": target_name,
-                    "target_chinese_name": target_cn_name,
+                    "target_chinese_name": target_row["chineseName"],
                     "source_id": best_match.get("产品ID", ""),
                     "source_name": best_match["产品名称"],
                     "source_score": best_match.get("评分", ""),
@@ -298,8 +473,11 @@ class MatchingEngine:
                     "source_votes": best_match.get("投票数", ""),
                     "source_summary": best_match.get("简介", ""),
                     "match_score": round(best_score, 4)
-                })
-                print(f"匹配成功：{target_name} -> {best_match['产品名称']} (得分: {best_score:.4f})")
+                }
+                # 空单元格写成空字段（与 DataFrame.to_csv 一致），而不是 "nan"
+                writer.writerow({key: "" if pd.isna(value) else value for key, value in record.items()})
+                matched_count += 1
+                # 逐条结果只记 INFO 日志（静默模式不输出到控制台），避免每行打印拖慢写出
+                self.logger.log_info(f"匹配成功：{target_name} -> {best_match['产品名称']} (得分: {best_score:.4f})")
 
-        pd.DataFrame(results).to_csv(output_file, index=False, encoding="utf-8-sig")
-        print(f"\n匹配结果已保存到：{output_file}  (共 {len(results)} 条)")
\ No newline at end of file
+        print(f"\n匹配结果已保存到：{output_file}  (共 {matched_count} 条)")
\ No newline at end of file
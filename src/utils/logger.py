@@ -1,18 +1,115 @@
 import os
-import json
+import sys
+import queue
+import time
+import atexit
+import logging
+import weakref
 import datetime
+import threading
+import logging.handlers
+from collections import deque
 from typing import Any, Dict
 
+import orjson
+
+
+_console_logger = None
+_console_listener = None
+
+
+def _get_console_logger() -> logging.Logger:
+    """
+    获取控制台输出用的 logger。
+
+    实际写 stdout 由后台 QueueListener 线程完成，并发协程/线程打日志时
+    只做一次入队，不会在 stdout 锁上互相阻塞。
+    """
+    global _console_logger, _console_listener
+    if _console_logger is None:
+        log_queue = queue.Queue(-1)
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(logging.Formatter("%(message)s"))
+        listener = logging.handlers.QueueListener(log_queue, stream_handler)
+        listener.start()
+        atexit.register(listener.stop)
+        
+        console_logger = logging.getLogger("ym_spider.console")
+        console_logger.setLevel(logging.INFO)
+        console_logger.propagate = False
+        console_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        _console_logger = console_logger
+        _console_listener = listener
+    return _console_logger
+
+
+API_LOG_FLUSH_INTERVAL = 5.0   # API 日志后台落盘间隔（秒）
+API_LOG_MAX_PENDING = 10000    # 待写条目达到该数量时立即落盘
+
+_api_loggers = weakref.WeakSet()
+_api_log_flusher = None
+
+
+def _flush_all_api_logs():
+    """将所有 Logger 的待写 API 日志落盘"""
+    for logger in list(_api_loggers):
+        logger.flush_api_log()
+
+
+def _api_log_flush_loop():
+    while True:
+        time.sleep(API_LOG_FLUSH_INTERVAL)
+        try:
+            _flush_all_api_logs()
+        except Exception as e:
+            # 后台线程一旦退出，之后的日志只能等队列满或退出时才落盘
+            print(f"后台写入API日志失败: {e}")
+
+
+def _register_api_logger(logger: "Logger"):
+    """登记 Logger，并在首次调用时启动后台落盘线程"""
+    global _api_log_flusher
+    _api_loggers.add(logger)
+    if _api_log_flusher is None:
+        _api_log_flusher = threading.Thread(target=_api_log_flush_loop, name="api-log-flusher", daemon=True)
+        _api_log_flusher.start()
+        atexit.register(_flush_all_api_logs)
+
+
+def flush_logs():
+    """
+    立即将 API 日志落盘，并输出控制台队列中尚未输出的日志。
+
+    进程池子进程退出时不执行 atexit 钩子，需要在任务结束前显式调用，否则这部分日志会丢失。
+    """
+    _flush_all_api_logs()
+    if _console_listener is not None:
+        # stop() 会先处理完队列中的剩余记录；之后重新启动，后续日志照常输出
+        _console_listener.stop()
+        _console_listener.start()
+
 
 class Logger:
     """日志管理工具类"""
     
+    THROTTLE_INTERVAL = 5.0  # 同类错误在该时间窗口（秒）内只输出一次
+    
     def __init__(self, silent_mode: bool = True):
         self.logs_dir = "logs"
         self.api_log_file = None
         self.silent_mode = silent_mode  # 静默模式，不输出INFO信息到控制台
+        self._console = _get_console_logger()
+        # API 响应先进入内存队列，由后台线程批量写入，避免每次请求都打开文件
+        self._api_log_pending = deque()
+        self._api_log_lock = threading.Lock()
+        # 限频错误：key -> (上次输出时间, 期间被抑制的条数)
+        self._throttled: Dict[str, tuple] = {}
+        # 时间戳精确到秒：同一秒内复用上次格式化的字符串
+        self._last_second = None
+        self._last_timestamp = ""
         self._ensure_logs_dir()
         self._init_api_log_file()
+        _register_api_logger(self)
     
     def _ensure_logs_dir(self):
         """确保日志目录存在"""
@@ -24,47 +121,82 @@ class Logger:
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         self.api_log_file = os.path.join(self.logs_dir, f"api_responses_{timestamp}.log")
     
+    def _now(self) -> str:
+        """当前时间字符串（``%Y-%m-%d %H:%M:%S``），秒数变化时才重新格式化"""
+        second = int(time.time())
+        if second != self._last_second:
+            self._last_timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+            self._last_second = second
+        return self._last_timestamp
+    
     def log_api_response(self, keyword: str, response_data: Dict[str, Any]):
-        """记录API响应信息"""
+        """记录API响应信息（先入队，定期批量落盘）"""
         if not self.api_log_file:
             return
         
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._api_log_pending.append((self._now(), keyword, response_data))
         
-        try:
-            with open(self.api_log_file, 'a', encoding='utf-8') as f:
-                f.write(f"\n{'='*80}\n")
-                f.write(f"时间: {timestamp}\n")
-                f.write(f"关键词: {keyword}\n")
-                f.write(f"API响应:\n")
-                f.write(json.dumps(response_data, indent=2, ensure_ascii=False))
-                f.write(f"\n{'='*80}\n")
-        except Exception as e:
-            print(f"写入API日志失败: {e}")
+        if len(self._api_log_pending) >= API_LOG_MAX_PENDING:
+            self.flush_api_log()
+    
+    def flush_api_log(self):
+        """将队列中的API响应一次性追加写入日志文件"""
+        with self._api_log_lock:
+            if not self._api_log_pending:
+                return
+            
+            chunks = []
+            while self._api_log_pending:
+                timestamp, keyword, response_data = self._api_log_pending.popleft()
+                chunks.append(f"\n{'='*80}\n")
+                chunks.append(f"时间: {timestamp}\n")
+                chunks.append(f"关键词: {keyword}\n")
+                chunks.append(f"API响应:\n")
+                try:
+                    chunks.append(orjson.dumps(response_data, option=orjson.OPT_INDENT_2, default=str).decode())
+                except Exception:
+                    # orjson 无法序列化（如非字符串键、超大整数）时退回 repr，不丢弃同批其他条目
+                    chunks.append(repr(response_data))
+                chunks.append(f"\n{'='*80}\n")
+            
+            try:
+                with open(self.api_log_file, 'a', encoding='utf-8') as f:
+                    f.write("".join(chunks))
+            except Exception as e:
+                print(f"写入API日志失败: {e}")
     
     def log_info(self, message: str):
         """记录信息日志"""
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_message = f"[INFO] {timestamp} - {message}"
-        
-        # 在静默模式下，INFO信息只写入日志文件，不输出到控制台
+        # 在静默模式下，INFO信息不输出到控制台，也就不必拼接消息
         if not self.silent_mode:
-            print(log_message)
+            self._console.info(f"[INFO] {self._now()} - {message}")
     
     def log_error(self, message: str):
         """记录错误日志"""
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_message = f"[ERROR] {timestamp} - {message}"
-        print(log_message)  # 错误信息总是输出到控制台
+        log_message = f"[ERROR] {self._now()} - {message}"
+        self._console.error(log_message)  # 错误信息总是输出到控制台
     
     def log_warning(self, message: str):
         """记录警告日志"""
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_message = f"[WARNING] {timestamp} - {message}"
-        print(log_message)  # 警告信息总是输出到控制台
+        log_message = f"[WARNING] {self._now()} - {message}"
+        self._console.warning(log_message)  # 警告信息总是输出到控制台
+    
+    def log_error_throttled(self, key: str, message: str):
+        """
+        限频记录错误：同一 ``key`` 在 ``THROTTLE_INTERVAL`` 秒内只输出一次，
+        期间被抑制的条数附在下一次输出中，避免大量失败请求刷屏
+        """
+        now = time.monotonic()
+        last, suppressed = self._throttled.get(key, (None, 0))
+        if last is not None and now - last < self.THROTTLE_INTERVAL:
+            self._throttled[key] = (last, suppressed + 1)
+            return
+        self._throttled[key] = (now, 0)
+        if suppressed:
+            message = f"{message}（此前另有 {suppressed} 条同类错误未显示）"
+        self.log_error(message)
     
     def log_important(self, message: str):
         """记录重要信息（总是输出到控制台）"""
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_message = f"[IMPORTANT] {timestamp} - {message}"
-        print(log_message) 
\ No newline at end of file
+        log_message = f"[IMPORTANT] {self._now()} - {message}"
+        self._console.info(log_message) 
\ No newline at end of file
@@ -0,0 +1,61 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+import orjson
+
+
+class QueryCache:
+    """基于 SQLite 的 API 查询结果持久化缓存，跨运行复用已获取的数据"""
+
+    def __init__(self, db_path: str, namespace: str = "search"):
+        """
+        初始化缓存
+
+        Args:
+            db_path: SQLite 文件路径
+            namespace: 表名，用于区分搜索结果 / 会社详情等不同数据
+        """
+        self.db_path = db_path
+        self.namespace = namespace
+        self._lock = threading.Lock()
+
+        cache_dir = os.path.dirname(db_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {namespace} ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, fetched_at INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存，未命中返回 ``None``"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value FROM {self.namespace} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return orjson.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        """写入（覆盖）缓存"""
+        blob = orjson.dumps(value)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.namespace} (key, value, fetched_at) VALUES (?, ?, ?)",
+                (key, blob, int(time.time()))
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,50 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶限流器（同步版本，对应 ``AsyncTokenBucket``）
+
+    按 ``rate`` 个/秒补充令牌，最多积攒 ``burst`` 个；多个线程共用同一个桶时，
+    整体速率不超过 ``rate``。也可作为上下文管理器使用：``with bucket: ...`` 进入时取一个令牌。
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Args:
+            rate: 每秒补充的令牌数，<= 0 表示不限速
+            burst: 令牌桶容量（允许的最大突发请求数）
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        """按距上次更新的时间补充令牌"""
+        now = time.monotonic()
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """获取一个令牌，不足时阻塞等待补充"""
+        if self.rate <= 0:
+            return
+
+        # 持锁等待，保证排队的线程依次放行
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                time.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False